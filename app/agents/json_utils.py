@@ -1,59 +1,129 @@
 from __future__ import annotations
-from typing import Type, TypeVar, Optional
+import re
+from functools import lru_cache
+from typing import Generator, Type, TypeVar, List
 from pydantic import BaseModel
 from langchain.output_parsers import PydanticOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from ..llm_factory import ainvoke_bounded
 
 T = TypeVar("T", bound=BaseModel)
 
-_SCHEMA_MARKERS = ['"$defs"', '"properties"', '"required"', '"title"', '"type"']
+_SCHEMA_RE = re.compile(r'"\$defs"|"properties"|"required"|"title"|"type"')
 
 def looks_like_schema(text: str) -> bool:
-    t = text or ""
-    return any(m in t for m in _SCHEMA_MARKERS)
+    return _SCHEMA_RE.search(text or "") is not None
 
-def safe_pydantic_call(
-    llm: BaseChatModel,
+@lru_cache(maxsize=None)
+def _parser_for(model: Type[BaseModel]) -> PydanticOutputParser:
+    return PydanticOutputParser(pydantic_object=model)
+
+@lru_cache(maxsize=None)
+def _format_instructions_for(model: Type[BaseModel]) -> str:
+    # schema JSON serialization is a pure function of the model class
+    return _parser_for(model).get_format_instructions()
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+def _extract_json_block(text: str) -> str:
+    t = _FENCE_RE.sub("", (text or "").strip())
+    start, end = t.find("{"), t.rfind("}")
+    return t[start:end + 1] if 0 <= start < end else t
+
+def _parse(parser: PydanticOutputParser, model: Type[T], text: str) -> T:
+    # Happy path: pydantic parses + validates the JSON in one pass (no intermediate dict);
+    # the LangChain parser stays as the lenient fallback for odd outputs
+    try:
+        return model.model_validate_json(_extract_json_block(text))
+    except ValueError:
+        return parser.parse(text)
+
+# Repair prompts are built as ready message objects, not templates: the format instructions
+# and the model's broken answer are full of JSON braces, which a template would try to
+# parse as variables. This also skips template parsing on every repair.
+def _repair_system_message(model: Type[BaseModel], repair_system: str) -> SystemMessage:
+    return SystemMessage(content=repair_system + "\n" + _format_instructions_for(model))
+
+def _schema_repair_messages(model: Type[BaseModel], variables: dict, repair_system: str) -> List[BaseMessage]:
+    return [
+        _repair_system_message(model, repair_system),
+        HumanMessage(content=variables.get("human_hint","") or "Верни только JSON-объект данных."),
+    ]
+
+def _parse_repair_messages(model: Type[BaseModel], text: str, repair_system: str) -> List[BaseMessage]:
+    return [
+        _repair_system_message(model, repair_system),
+        HumanMessage(content=f"Вот твой неверный ответ:\n{text}\n\nИсправь и верни только корректный JSON-объект данных."),
+    ]
+
+def _call_steps(
     model: Type[T],
     prompt: ChatPromptTemplate,
     variables: dict,
     repair_system: str,
-    max_retries: int = 2,
-) -> T:
-    """Robust call that prevents 'JSON Schema' answers and retries parsing.
-
-    We intentionally avoid OutputFixingParser here because some models will 'fix' into schema again.
-    This helper uses an explicit repair prompt and falls back to defaults.
-    """
-    parser = PydanticOutputParser(pydantic_object=model)
+    max_retries: int,
+) -> Generator[List[BaseMessage], str, T]:
+    # The parse/repair/retry logic shared by the sync and async callers: yields the messages
+    # to send, receives the model's text answer, returns the parsed result.
+    parser = _parser_for(model)
 
-    last_text: Optional[str] = None
+    # the prompt is identical on every retry: render it once
+    msgs = prompt.format_messages(**variables, format_instructions=_format_instructions_for(model))
     for _ in range(max_retries + 1):
-        msgs = prompt.format_messages(**variables, format_instructions=parser.get_format_instructions())
-        text = llm.invoke(msgs).content
-        last_text = text
+        text = yield msgs
 
         if looks_like_schema(text):
             # hard repair if model returned schema
-            repair_prompt = ChatPromptTemplate.from_messages([
-                ("system", repair_system + "\n" + parser.get_format_instructions()),
-                ("human", variables.get("human_hint","") or "Верни только JSON-объект данных.")
-            ])
-            text = llm.invoke(repair_prompt.format_messages()).content
-            last_text = text
+            text = yield _schema_repair_messages(model, variables, repair_system)
 
         try:
-            return parser.parse(text)
+            return _parse(parser, model, text)
         except Exception:
-            repair_prompt = ChatPromptTemplate.from_messages([
-                ("system", repair_system + "\n" + parser.get_format_instructions()),
-                ("human", f"Вот твой неверный ответ:\n{text}\n\nИсправь и верни только корректный JSON-объект данных.")
-            ])
-            last_text = llm.invoke(repair_prompt.format_messages()).content
+            fixed = yield _parse_repair_messages(model, text, repair_system)
             try:
-                return parser.parse(last_text)
+                return _parse(parser, model, fixed)
             except Exception:
                 continue
 
     return model()  # type: ignore
+
+def safe_pydantic_call(
+    llm: BaseChatModel,
+    model: Type[T],
+    prompt: ChatPromptTemplate,
+    variables: dict,
+    repair_system: str,
+    max_retries: int = 2,
+) -> T:
+    """Robust call that prevents 'JSON Schema' answers and retries parsing.
+
+    We intentionally avoid OutputFixingParser here because some models will 'fix' into schema again.
+    This helper uses an explicit repair prompt and falls back to defaults.
+    """
+    steps = _call_steps(model, prompt, variables, repair_system, max_retries)
+    try:
+        msgs = next(steps)
+        while True:
+            msgs = steps.send(llm.invoke(msgs).content)
+    except StopIteration as done:
+        return done.value
+
+async def asafe_pydantic_call(
+    llm: BaseChatModel,
+    model: Type[T],
+    prompt: ChatPromptTemplate,
+    variables: dict,
+    repair_system: str,
+    max_retries: int = 2,
+) -> T:
+    """Async twin of safe_pydantic_call (llm.ainvoke) so agents can run concurrently."""
+    steps = _call_steps(model, prompt, variables, repair_system, max_retries)
+    try:
+        msgs = next(steps)
+        while True:
+            msgs = steps.send((await ainvoke_bounded(llm, msgs)).content)
+    except StopIteration as done:
+        return done.value
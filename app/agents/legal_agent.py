@@ -1,16 +1,30 @@
 from __future__ import annotations
+import asyncio
+import hashlib
+from typing import TYPE_CHECKING, List, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 
+from ..cache import TTLCache
+from ..config import settings
 from ..llm_factory import make_llm
 from ..models import LegalResult
-from ..rag.legal_rag import LegalRAG
-from .json_utils import safe_pydantic_call
+from .json_utils import safe_pydantic_call, asafe_pydantic_call
+from .llm_cache import SemanticCache
+
+if TYPE_CHECKING:
+    from ..rag.legal_rag import LegalRAG, RetrievedChunk
 
 class LegalAgent:
-    def __init__(self, rag: LegalRAG | None = None):
-        self.rag = rag or LegalRAG()
+    def __init__(self, rag: LegalRAG | None = None, cache: TTLCache | None = None):
+        # Chroma + embeddings client are created on the first legal question, not at bot startup
+        self._rag = rag
+        # Final answers keyed by (question, retrieved context): repeated questions skip the LLM
+        self.cache = cache or TTLCache(default_ttl_seconds=24 * 3600)
+        # Reworded repeats ("штрафы в Турции" / "какие штрафы Турция") over the same retrieved
+        # context skip the LLM
+        self.similar = SemanticCache(ttl_seconds=24 * 3600)
         # Give the model enough room to output full structured info
-        self.llm = make_llm(temperature=0.0, max_tokens=1400)
+        self.llm = make_llm(temperature=0.0, max_tokens=settings.legal_max_tokens)
 
         self.prompt = ChatPromptTemplate.from_messages([
             ("system",
@@ -39,21 +53,45 @@ class LegalAgent:
              "Верни только JSON LegalResult.")
         ])
 
-    def run(self, country: str | None, city: str | None, question: str) -> LegalResult:
+    @property
+    def rag(self) -> LegalRAG:
+        if self._rag is None:
+            from ..rag.legal_rag import LegalRAG
+            self._rag = LegalRAG()
+        return self._rag
+
+    _REPAIR_SYSTEM = (
+        "Ты исправляешь формат. Верни только JSON-объект LegalResult (данные). "
+        "Строго опирайся на контекст. НЕ возвращай JSON Schema."
+    )
+    _SECOND_PASS_REPAIR_SYSTEM = (
+        "Верни только JSON LegalResult. Заполни списки пунктами из контекста. "
+        "НЕ добавляй факты вне контекста."
+    )
+
+    @staticmethod
+    def _query(country: str | None, city: str | None, question: str) -> str:
         # Make query "dense" for retrieval: destination + explicit legal intent
         base_q = ", ".join([x for x in [city, country] if x]).strip()
-        query = f"{base_q} визы законы правила въезда штрафы {question}".strip()
-        chunks = self.rag.retrieve(query, country=country, k=10)
+        return f"{base_q} визы законы правила въезда штрафы {question}".strip()
 
-        if not chunks:
-            return LegalResult(
-                visa_required=None,
-                missing_info="Локальная база пуста или индекс не построен. Добавьте документы в kb/legal и запустите: py -m scripts.build_legal_index",
-                sources=[],
-            )
+    @staticmethod
+    def _empty_kb_result() -> LegalResult:
+        return LegalResult(
+            visa_required=None,
+            missing_info="Локальная база пуста или индекс не построен. Добавьте документы в kb/legal и запустите: py -m scripts.build_legal_index",
+            sources=[],
+        )
 
-        context = "\n\n".join([f"[{c.source}]\n{c.chunk}" for c in chunks])
-        sources = sorted({c.source for c in chunks})
+    @staticmethod
+    def _variables(country: str | None, city: str | None, question: str, chunks: List[RetrievedChunk]) -> Tuple[dict, List[str]]:
+        parts: List[str] = []
+        source_set = set()
+        for c in chunks:
+            parts.append(f"[{c.source}]\n{c.chunk}")
+            source_set.add(c.source)
+        context = "\n\n".join(parts)
+        sources = sorted(source_set)
 
         variables = {
             "country": country or "не указано",
@@ -62,40 +100,113 @@ class LegalAgent:
             "context": context,
             "human_hint": f"Источники: {', '.join(sources)}. Верни только JSON LegalResult. Не оставляй поля пустыми если в контексте есть информация."
         }
+        return variables, sources
+
+    @staticmethod
+    def _needs_second_pass(result: LegalResult) -> bool:
+        # The model answered only visa_required but left everything empty
+        return (result.visa_required is not None) and not (result.visa or result.entry_and_registration or result.prohibitions_and_fines or result.recommendations) and not result.missing_info
 
-        result = safe_pydantic_call(
+    @staticmethod
+    def _second_pass_variables(variables: dict) -> dict:
+        variables2 = dict(variables)
+        variables2["question"] = "Собери из контекста максимально подробные пункты по визе/въезду/штрафам."
+        return variables2
+
+    @staticmethod
+    def _context_digest(variables: dict) -> str:
+        return hashlib.blake2b(variables["context"].encode("utf-8"), digest_size=16).hexdigest()
+
+    @classmethod
+    def _cache_key(cls, variables: dict) -> str:
+        question = " ".join((variables.get("question") or "").lower().split())
+        raw = f"{variables['country']}|{variables['city']}|{question}|{cls._context_digest(variables)}"
+        return "legal:" + hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _cached(self, key: str) -> Optional[LegalResult]:
+        hit = self.cache.get(key)
+        return hit.model_copy(deep=True) if hit is not None else None
+
+    @classmethod
+    def _scope(cls, variables: dict) -> str:
+        # Keyed on the retrieved context like the exact cache: a rebuilt/updated KB changes
+        # the context and so stops serving answers derived from the old one
+        return f"{variables['country'].lower()}|{variables['city'].lower()}|{cls._context_digest(variables)}"
+
+    def _remember(self, key: str, result: LegalResult, variables: dict, question: str) -> None:
+        # Don't pin uncertain answers (parse fallback / "no data in KB")
+        has_content = result.visa or result.entry_and_registration or result.prohibitions_and_fines or result.recommendations
+        if result.missing_info or (result.visa_required is None and not has_content):
+            return
+        self.cache.set(key, result.model_copy(deep=True))
+        self.similar.set(self._scope(variables), question, result)
+
+    def _prepare(
+        self, country: str | None, city: str | None, question: str, chunks: List[RetrievedChunk]
+    ) -> Tuple[Optional[LegalResult], str, dict, List[str]]:
+        # -> (ready result or None, cache key, prompt variables, sources)
+        if not chunks:
+            return self._empty_kb_result(), "", {}, []
+        variables, sources = self._variables(country, city, question, chunks)
+        key = self._cache_key(variables)
+        ready = self._cached(key) or self.similar.get(self._scope(variables), question, LegalResult)
+        return ready, key, variables, sources
+
+    def _call_kwargs(self, variables: dict) -> dict:
+        return dict(
             llm=self.llm,
             model=LegalResult,
             prompt=self.prompt,
             variables=variables,
-            repair_system=(
-                "Ты исправляешь формат. Верни только JSON-объект LegalResult (данные). "
-                "Строго опирайся на контекст. НЕ возвращай JSON Schema."
-            ),
+            repair_system=self._REPAIR_SYSTEM,
             max_retries=2,
         )
 
+    def _second_pass_kwargs(self, result: LegalResult, variables: dict) -> Optional[dict]:
+        # Optional light second pass (still constrained to the context)
+        if not (settings.legal_second_pass and self._needs_second_pass(result)):
+            return None
+        return dict(
+            llm=self.llm,
+            model=LegalResult,
+            prompt=self.prompt,
+            variables=self._second_pass_variables(variables),
+            repair_system=self._SECOND_PASS_REPAIR_SYSTEM,
+            max_retries=1,
+        )
+
+    @staticmethod
+    def _with_sources(result: LegalResult, sources: List[str]) -> LegalResult:
         # Always include sources from retrieved chunks
         if not result.sources:
             result.sources = sources
+        return result
+
+    def run(self, country: str | None, city: str | None, question: str) -> LegalResult:
+        chunks = self.rag.retrieve(self._query(country, city, question), country=country, k=10)
+        ready, key, variables, sources = self._prepare(country, city, question, chunks)
+        if ready is not None:
+            return ready
+
+        result = self._with_sources(safe_pydantic_call(**self._call_kwargs(variables)), sources)
+        second = self._second_pass_kwargs(result, variables)
+        if second is not None:
+            result = self._with_sources(safe_pydantic_call(**second), sources)
+
+        self._remember(key, result, variables, question)
+        return result
+
+    async def arun(self, country: str | None, city: str | None, question: str) -> LegalResult:
+        """Same as run(), but does not block the event loop (Chroma in a thread, LLM via ainvoke)."""
+        chunks = await asyncio.to_thread(self.rag.retrieve, self._query(country, city, question), country, 10)
+        ready, key, variables, sources = self._prepare(country, city, question, chunks)
+        if ready is not None:
+            return ready
 
-        # If the model answered only visa_required but left everything empty, try a light second pass (still constrained)
-        if (result.visa_required is not None) and not (result.visa or result.entry_and_registration or result.prohibitions_and_fines or result.recommendations) and not result.missing_info:
-            variables2 = dict(variables)
-            variables2["question"] = "Собери из контекста максимально подробные пункты по визе/въезду/штрафам."
-            result2 = safe_pydantic_call(
-                llm=self.llm,
-                model=LegalResult,
-                prompt=self.prompt,
-                variables=variables2,
-                repair_system=(
-                    "Верни только JSON LegalResult. Заполни списки пунктами из контекста. "
-                    "НЕ добавляй факты вне контекста."
-                ),
-                max_retries=1,
-            )
-            if not result2.sources:
-                result2.sources = sources
-            result = result2
+        result = self._with_sources(await asafe_pydantic_call(**self._call_kwargs(variables)), sources)
+        second = self._second_pass_kwargs(result, variables)
+        if second is not None:
+            result = self._with_sources(await asafe_pydantic_call(**second), sources)
 
+        self._remember(key, result, variables, question)
         return result
@@ -0,0 +1,139 @@
+from __future__ import annotations
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import FrozenSet, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from ..cache import TTLCache
+from ..config import settings
+from .json_utils import safe_pydantic_call, asafe_pydantic_call
+
+T = TypeVar("T", bound=BaseModel)
+
+# Process-wide cache of parsed LLM answers (stored as JSON, rehydrated per hit so callers
+# may mutate the returned model freely).
+_cache = TTLCache(default_ttl_seconds=settings.llm_cache_ttl_s, max_items=2000)
+_lock = threading.Lock()
+# Agent prompts live for the whole process, so the template hash is computed once per prompt
+_template_fps: dict = {}
+
+def _template_fingerprint(prompt: ChatPromptTemplate) -> str:
+    fp = _template_fps.get(id(prompt))
+    if fp is None:
+        fp = hashlib.sha256(prompt.pretty_repr().encode("utf-8")).hexdigest()[:16]
+        _template_fps[id(prompt)] = fp
+    return fp
+
+def response_key(llm: BaseChatModel, model: Type[BaseModel], prompt: ChatPromptTemplate, variables: dict) -> str:
+    payload = {
+        "v": settings.llm_cache_version,
+        "llm": [getattr(llm, "model", None), getattr(llm, "temperature", None), getattr(llm, "max_tokens", None)],
+        "out": model.__name__,
+        "tpl": _template_fingerprint(prompt),
+        "vars": variables,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return "llm:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _get(key: str, model: Type[T]) -> T | None:
+    with _lock:
+        hit = _cache.get(key)
+    return model.model_validate_json(hit) if hit is not None else None
+
+def _put(key: str, res: BaseModel, model: Type[BaseModel]) -> None:
+    # model() is the "everything failed" fallback of safe_pydantic_call — never cache it
+    if res == model():
+        return
+    with _lock:
+        _cache.set(key, res.model_dump_json())
+
+def cached_safe_pydantic_call(
+    llm: BaseChatModel,
+    model: Type[T],
+    prompt: ChatPromptTemplate,
+    variables: dict,
+    repair_system: str,
+    max_retries: int = 2,
+) -> T:
+    """safe_pydantic_call with a TTL cache keyed by (model, template, variables)."""
+    key = response_key(llm, model, prompt, variables)
+    hit = _get(key, model)
+    if hit is not None:
+        return hit
+    res = safe_pydantic_call(llm, model, prompt, variables, repair_system, max_retries)
+    _put(key, res, model)
+    return res
+
+async def acached_safe_pydantic_call(
+    llm: BaseChatModel,
+    model: Type[T],
+    prompt: ChatPromptTemplate,
+    variables: dict,
+    repair_system: str,
+    max_retries: int = 2,
+) -> T:
+    key = response_key(llm, model, prompt, variables)
+    hit = _get(key, model)
+    if hit is not None:
+        return hit
+    res = await asafe_pydantic_call(llm, model, prompt, variables, repair_system, max_retries)
+    _put(key, res, model)
+    return res
+
+
+_WORD_RE = re.compile(r"[0-9a-zа-я]+")
+_STOP_WORDS = frozenset({
+    "какие", "какой", "какая", "каков", "что", "как", "где", "когда", "нужно", "нужна", "нужен",
+    "можно", "ли", "для", "при", "про", "мне", "меня", "это", "есть", "там", "the", "and", "what",
+})
+
+def _shingles(text: str) -> FrozenSet[str]:
+    # crude stemming: first 5 letters cover most Russian inflections (Турция/Турции/Турцию)
+    words = _WORD_RE.findall((text or "").lower().replace("ё", "е"))
+    return frozenset(w[:5] for w in words if len(w) > 2 and w not in _STOP_WORDS)
+
+class SemanticCache:
+    """Near-duplicate cache: same scope (country|city) + similar wording -> reuse the answer.
+
+    Similarity is Jaccard over stemmed word sets; a scope rarely holds more than a few
+    dozen questions, so an exact scan is cheaper than an LSH index.
+    """
+
+    def __init__(self, threshold: float = 0.8, ttl_seconds: int = 3 * 3600, max_per_scope: int = 64):
+        self.threshold = threshold
+        self.ttl = ttl_seconds
+        self.max_per_scope = max_per_scope
+        self._scopes = TTLCache(default_ttl_seconds=ttl_seconds, max_items=2000)
+        self._lock = threading.Lock()
+
+    def get(self, scope: str, text: str, model: Type[T]) -> Optional[T]:
+        sh = _shingles(text)
+        if not sh:
+            return None
+        now = time.time()
+        best, best_score = None, self.threshold
+        with self._lock:
+            entries: List[Tuple[float, FrozenSet[str], str]] = self._scopes.get(scope) or []
+            for expires_at, other, payload in entries:
+                if expires_at < now:
+                    continue
+                score = len(sh & other) / len(sh | other)
+                if score >= best_score:
+                    best, best_score = payload, score
+        return model.model_validate_json(best) if best is not None else None
+
+    def set(self, scope: str, text: str, result: BaseModel) -> None:
+        sh = _shingles(text)
+        if not sh:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [e for e in (self._scopes.get(scope) or []) if e[0] >= now and e[1] != sh]
+            entries.append((now + self.ttl, sh, result.model_dump_json()))
+            self._scopes.set(scope, entries[-self.max_per_scope:])
@@ -1,9 +1,13 @@
 from __future__ import annotations
-import httpx
+import asyncio
+import orjson
 
 from ..models import RouteResult, RouteStep
 from ..config import settings
-from ..cache import TTLCache
+from ..cache import NEGATIVE, NEGATIVE_TTL_SECONDS, TTLCache
+from ..http_client import get_client
+
+_MAX_STEPS = 20
 
 class RouteAgent:
     def __init__(self, cache: TTLCache | None = None):
@@ -13,40 +17,44 @@ class RouteAgent:
         qn = (q or "").strip()
         if not qn:
             return None
-        cache_key = f"geo:{qn.lower()}"
-        cached = self.cache.get(cache_key)
+        # `geo_ll:` holds (lat, lon) shared with WeatherAgent/POIRouteBuilder; misses are
+        # per geocoder (`nom_miss:`): Open-Meteo may know a place Nominatim doesn't
+        qk = qn.casefold()
+        cached = self.cache.get(f"geo_ll:{qk}")
         if cached is not None:
-            return cached
+            return cached[0], cached[1]
+        miss_key = f"nom_miss:{qk}"
+        if self.cache.get(miss_key) is NEGATIVE:
+            return None
 
         url = "https://nominatim.openstreetmap.org/search"
         params = {"q": qn, "format": "json", "limit": 1}
         headers = {"User-Agent": "travel-bot/1.0"}
-        async with httpx.AsyncClient(timeout=20, headers=headers) as client:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            data = r.json()
-            if not data:
-                return None
-            lat, lon = float(data[0]["lat"]), float(data[0]["lon"])
-            self.cache.set(cache_key, (lat, lon), ttl_seconds=7 * 24 * 3600)
-            return lat, lon
+        r = await get_client().get(url, params=params, headers=headers, timeout=20)
+        r.raise_for_status()
+        data = orjson.loads(r.content)
+        if not data:
+            self.cache.set(miss_key, NEGATIVE, ttl_seconds=NEGATIVE_TTL_SECONDS)
+            return None
+        lat, lon = float(data[0]["lat"]), float(data[0]["lon"])
+        self.cache.set(f"geo_ll:{qk}", (lat, lon), ttl_seconds=7 * 24 * 3600)
+        return lat, lon
 
     async def fetch_osrm_route(self, a_ll: tuple[float,float], b_ll: tuple[float,float]) -> dict:
         (alat, alon), (blat, blon) = a_ll, b_ll
-        url = f"{settings.osrm_base_url}/route/v1/driving/{alon},{alat};{blon},{blat}"
-        params = {"overview": "false", "steps": "true"}
-
         cache_key = f"osrm:{alon},{alat}->{blon},{blat}"
         cached = self.cache.get(cache_key)
         if cached is not None:
             return cached
 
-        async with httpx.AsyncClient(timeout=25) as client:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            data = r.json()
-            self.cache.set(cache_key, data, ttl_seconds=6 * 3600)
-            return data
+        # constant query string: no params dict to merge/encode per request
+        url = f"{settings.osrm_base_url}/route/v1/driving/{alon},{alat};{blon},{blat}?overview=false&steps=true"
+        r = await get_client().get(url, timeout=25)
+        r.raise_for_status()
+        data = orjson.loads(r.content)
+        ok = data.get("code") == "Ok" and data.get("routes")
+        self.cache.set(cache_key, data, ttl_seconds=6 * 3600 if ok else NEGATIVE_TTL_SECONDS)
+        return data
 
     @staticmethod
     def google_maps_url(a_ll: tuple[float,float], b_ll: tuple[float,float], travelmode: str = "driving") -> str:
@@ -74,8 +82,8 @@ class RouteAgent:
         a = (start_location or "").strip()
         b = (end_location or "").strip()
 
-        a_ll = await self.geocode_nominatim(a)
-        b_ll = await self.geocode_nominatim(b)
+        # Two independent lookups: overlap the round-trips
+        a_ll, b_ll = await asyncio.gather(self.geocode_nominatim(a), self.geocode_nominatim(b))
         if not a_ll or not b_ll:
             return RouteResult(
                 start=a or "не указано",
@@ -93,21 +101,27 @@ class RouteAgent:
             dist_km = float(route0.get("distance", 0)) / 1000.0
             dur_min = float(route0.get("duration", 0)) / 60.0
 
+            # only the first _MAX_STEPS are shown: don't build RouteStep for the rest of a long route
             steps_out: list[RouteStep] = []
             for leg in route0.get("legs", []):
                 for st in leg.get("steps", []):
-                    steps_out.append(RouteStep(
+                    if len(steps_out) >= _MAX_STEPS:
+                        break
+                    steps_out.append(RouteStep.model_construct(
                         instruction=self._step_instruction(st),
                         distance_m=int(st.get("distance", 0)) if st.get("distance") is not None else None,
                         duration_s=int(st.get("duration", 0)) if st.get("duration") is not None else None,
                     ))
+                if len(steps_out) >= _MAX_STEPS:
+                    break
 
-            return RouteResult(
+            # values are typed by construction above: no validation pass needed
+            return RouteResult.model_construct(
                 start=a,
                 end=b,
                 distance_km=dist_km,
                 duration_min=dur_min,
-                steps=steps_out[:20],
+                steps=steps_out,
                 notes=[],
                 maps_url=self.google_maps_url(a_ll, b_ll, travelmode="driving"),
                 source="osrm",
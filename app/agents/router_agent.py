@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 from langchain_core.prompts import ChatPromptTemplate
+from ..config import settings
 from ..llm_factory import make_llm
 from ..models import RouteDecision
-from .json_utils import safe_pydantic_call
+from .llm_cache import cached_safe_pydantic_call, acached_safe_pydantic_call
 
 class RouterAgent:
     def __init__(self):
-        self.llm = make_llm(temperature=0.0, max_tokens=650)
+        self.llm = make_llm(temperature=0.0, max_tokens=settings.router_max_tokens)
 
         self.prompt = ChatPromptTemplate.from_messages([
             ("system",
@@ -28,21 +29,39 @@ class RouterAgent:
              "Верни JSON RouteDecision, обязательно заполни user_question (можно повторить сообщение).")
         ])
 
-    def decide(self, text: str, memory_hint: str = "") -> RouteDecision:
-        variables = {
+    _REPAIR_SYSTEM = (
+        "Ты исправляешь формат вывода. Верни только JSON-объект RouteDecision (данные). "
+        "НЕ возвращай JSON Schema и не используй $defs/properties/required."
+    )
+
+    @staticmethod
+    def _variables(text: str, memory_hint: str) -> dict:
+        return {
             "text": text,
             "memory_hint": memory_hint,
             "human_hint": f"Память: {memory_hint}\nСообщение: {text}\nВерни только JSON RouteDecision."
         }
-        res = safe_pydantic_call(
+
+    def decide(self, text: str, memory_hint: str = "") -> RouteDecision:
+        res = cached_safe_pydantic_call(
+            llm=self.llm,
+            model=RouteDecision,
+            prompt=self.prompt,
+            variables=self._variables(text, memory_hint),
+            repair_system=self._REPAIR_SYSTEM,
+            max_retries=2,
+        )
+        if not res.user_question:
+            res.user_question = text
+        return res
+
+    async def adecide(self, text: str, memory_hint: str = "") -> RouteDecision:
+        res = await acached_safe_pydantic_call(
             llm=self.llm,
             model=RouteDecision,
             prompt=self.prompt,
-            variables=variables,
-            repair_system=(
-                "Ты исправляешь формат вывода. Верни только JSON-объект RouteDecision (данные). "
-                "НЕ возвращай JSON Schema и не используй $defs/properties/required."
-            ),
+            variables=self._variables(text, memory_hint),
+            repair_system=self._REPAIR_SYSTEM,
             max_retries=2,
         )
         if not res.user_question:
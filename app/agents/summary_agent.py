@@ -1,12 +1,24 @@
 from __future__ import annotations
+import re
+from typing import Optional
 from langchain_core.prompts import ChatPromptTemplate
-from ..llm_factory import make_llm
+from ..config import settings
+from ..llm_factory import make_llm, ainvoke_bounded
+
+# A latest user message made only of these ("ок", "спасибо", "да, понятно") adds nothing
+# to the memory — keep the old summary
+_ACK_WORDS = frozenset({
+    "ок", "окей", "ага", "угу", "да", "нет", "спасибо", "спс", "благодарю", "большое",
+    "понял", "поняла", "понятно", "ясно", "хорошо", "отлично", "супер", "класс",
+    "ok", "okay", "thanks", "thx", "yes", "no", "cool",
+})
+_WORD_RE = re.compile(r"\w+")
 
 class SummaryAgent:
     """Сжимает историю диалога до короткой "памяти" для следующих запросов."""
 
     def __init__(self):
-        self.llm = make_llm(temperature=0.0, max_tokens=220)
+        self.llm = make_llm(temperature=0.0, max_tokens=settings.summary_max_tokens)
         self.prompt = ChatPromptTemplate.from_messages([
             ("system",
              "Ты модуль памяти для туристического бота. "
@@ -20,5 +32,22 @@ class SummaryAgent:
              "Новое резюме:")
         ])
 
-    def update(self, old_summary: str, recent: str) -> str:
-        return self.llm.invoke(self.prompt.format_messages(old_summary=old_summary or "", recent=recent or "")).content.strip()
+    @staticmethod
+    def _is_trivial(latest: Optional[str]) -> bool:
+        # latest is the newest user message; unknown -> always ask the LLM
+        if latest is None:
+            return False
+        return all(w in _ACK_WORDS for w in _WORD_RE.findall(latest.casefold()))
+
+    def update(self, old_summary: str, recent: str, latest: Optional[str] = None) -> str:
+        old_summary, recent = old_summary or "", recent or ""
+        if self._is_trivial(latest):
+            return old_summary
+        return self.llm.invoke(self.prompt.format_messages(old_summary=old_summary, recent=recent)).content.strip()
+
+    async def aupdate(self, old_summary: str, recent: str, latest: Optional[str] = None) -> str:
+        old_summary, recent = old_summary or "", recent or ""
+        if self._is_trivial(latest):
+            return old_summary
+        msg = await ainvoke_bounded(self.llm, self.prompt.format_messages(old_summary=old_summary, recent=recent))
+        return msg.content.strip()
@@ -1,13 +1,17 @@
 from __future__ import annotations
 from langchain_core.prompts import ChatPromptTemplate
 
+from ..config import settings
 from ..llm_factory import make_llm
 from ..models import TourismResult
-from .json_utils import safe_pydantic_call
+from .llm_cache import SemanticCache, cached_safe_pydantic_call, acached_safe_pydantic_call
 
 class TouristAgent:
     def __init__(self):
-        self.llm = make_llm(temperature=0.7, max_tokens=1800)
+        self.llm = make_llm(temperature=0.7, max_tokens=settings.tourist_max_tokens)
+        # Reworded repeats of a question about the same destination reuse the previous guide
+        # (only for answers not personalised by the user's memory summary)
+        self.similar = SemanticCache(ttl_seconds=settings.llm_cache_ttl_s)
 
         self.prompt = ChatPromptTemplate.from_messages([
             ("system",
@@ -30,8 +34,14 @@ class TouristAgent:
              "Верни только JSON TourismResult.")
         ])
 
-    def run(self, country: str | None, city: str | None, dates: str | None, question: str, summary: str = "") -> TourismResult:
-        variables = {
+    _REPAIR_SYSTEM = (
+        "Ты исправляешь формат вывода. Верни только JSON-объект TourismResult (данные). "
+        "НЕ возвращай JSON Schema и не используй $defs/properties/required."
+    )
+
+    @staticmethod
+    def _variables(country: str | None, city: str | None, dates: str | None, question: str, summary: str) -> dict:
+        return {
             "country": country or "не указано",
             "city": city or "не указано",
             "dates": dates or "не указано",
@@ -39,18 +49,57 @@ class TouristAgent:
             "summary": summary or "",
             "human_hint": f"Направление: {country},{city}. Даты:{dates}. Запрос:{question}. Верни только JSON TourismResult."
         }
-        res = safe_pydantic_call(
+
+    @staticmethod
+    def _scope(country: str | None, city: str | None, dates: str | None, summary: str) -> str | None:
+        # summary carries the user's preferences and is rewritten every turn: a personalised
+        # guide must not reach another user and would never be matched again anyway -> no scope
+        if summary:
+            return None
+        return f"{(country or '').lower()}|{(city or '').lower()}|{dates or ''}"
+
+    def _similar(self, scope: str | None, question: str) -> TourismResult | None:
+        return self.similar.get(scope, question, TourismResult) if scope is not None else None
+
+    def _remember(self, scope: str | None, question: str, res: TourismResult) -> None:
+        if scope is not None and res != TourismResult():
+            self.similar.set(scope, question, res)
+
+    @staticmethod
+    def _finalize(res: TourismResult, country: str | None, city: str | None) -> TourismResult:
+        if not res.destination_title:
+            parts = [p for p in [city, country] if p]
+            res.destination_title = ", ".join(parts) if parts else "Путешествие"
+        return res
+
+    def run(self, country: str | None, city: str | None, dates: str | None, question: str, summary: str = "") -> TourismResult:
+        scope = self._scope(country, city, dates, summary)
+        hit = self._similar(scope, question)
+        if hit is not None:
+            return self._finalize(hit, country, city)
+        res = cached_safe_pydantic_call(
             llm=self.llm,
             model=TourismResult,
             prompt=self.prompt,
-            variables=variables,
-            repair_system=(
-                "Ты исправляешь формат вывода. Верни только JSON-объект TourismResult (данные). "
-                "НЕ возвращай JSON Schema и не используй $defs/properties/required."
-            ),
+            variables=self._variables(country, city, dates, question, summary),
+            repair_system=self._REPAIR_SYSTEM,
             max_retries=2,
         )
-        if not res.destination_title:
-            parts = [p for p in [city, country] if p]
-            res.destination_title = ", ".join(parts) if parts else "Путешествие"
-        return res
+        self._remember(scope, question, res)
+        return self._finalize(res, country, city)
+
+    async def arun(self, country: str | None, city: str | None, dates: str | None, question: str, summary: str = "") -> TourismResult:
+        scope = self._scope(country, city, dates, summary)
+        hit = self._similar(scope, question)
+        if hit is not None:
+            return self._finalize(hit, country, city)
+        res = await acached_safe_pydantic_call(
+            llm=self.llm,
+            model=TourismResult,
+            prompt=self.prompt,
+            variables=self._variables(country, city, dates, question, summary),
+            repair_system=self._REPAIR_SYSTEM,
+            max_retries=2,
+        )
+        self._remember(scope, question, res)
+        return self._finalize(res, country, city)
@@ -2,11 +2,13 @@ from __future__ import annotations
 
 from typing import Optional, Tuple, List
 import datetime as dt
-import httpx
+import orjson
+import urllib.parse
 
 from ..models import WeatherResult
 from ..config import settings
-from ..cache import TTLCache
+from ..cache import NEGATIVE, NEGATIVE_TTL_SECONDS, TTLCache
+from ..http_client import get_client
 
 _WEATHER_CODE_RU = {
     0: "ясно",
@@ -39,6 +41,14 @@ _WEATHER_CODE_RU = {
     99: "гроза с градом (сильная)",
 }
 
+# Constant part of the forecast query, encoded once
+_FORECAST_QUERY = urllib.parse.urlencode({
+    "daily": "weathercode,temperature_2m_max,temperature_2m_min,precipitation_probability_max,windspeed_10m_max",
+    "current_weather": "true",
+    "timezone": "auto",
+    "forecast_days": 3,
+})
+
 class WeatherAgent:
     """Погода через Open-Meteo (без ключей)."""
 
@@ -50,51 +60,50 @@ class WeatherAgent:
         if not q:
             return None
 
-        cache_key = f"om_geo:{q.lower()}"
-        cached = self.cache.get(cache_key)
+        # `geo_ll:` holds (lat, lon) shared with RouteAgent/POIRouteBuilder; the display label
+        # ("name, admin1, country") is ours alone (`om_label:`, the query if Nominatim filled
+        # the coordinates), and so are misses (`om_miss:`)
+        qk = q.casefold()
+        cached = self.cache.get(f"geo_ll:{qk}")
         if cached is not None:
-            return cached
+            return cached[0], cached[1], self.cache.get(f"om_label:{qk}") or q
+        miss_key = f"om_miss:{qk}"
+        if self.cache.get(miss_key) is NEGATIVE:
+            return None
 
         url = f"{settings.open_meteo_geocoding_url}/search"
         params = {"name": q, "count": 1, "language": "ru", "format": "json"}
-        async with httpx.AsyncClient(timeout=20) as client:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            data = r.json() or {}
-            results = data.get("results") or []
-            if not results:
-                return None
-            lat = float(results[0]["latitude"])
-            lon = float(results[0]["longitude"])
-            display = results[0].get("name") or q
-            country = results[0].get("country") or ""
-            admin1 = results[0].get("admin1") or ""
-            label = ", ".join([x for x in [display, admin1, country] if x]).strip()
-            out = (lat, lon, label)
-            self.cache.set(cache_key, out, ttl_seconds=24 * 3600)
-            return out
+        r = await get_client().get(url, params=params, timeout=20)
+        r.raise_for_status()
+        data = orjson.loads(r.content) or {}
+        results = data.get("results") or []
+        if not results:
+            self.cache.set(miss_key, NEGATIVE, ttl_seconds=NEGATIVE_TTL_SECONDS)
+            return None
+        lat = float(results[0]["latitude"])
+        lon = float(results[0]["longitude"])
+        display = results[0].get("name") or q
+        country = results[0].get("country") or ""
+        admin1 = results[0].get("admin1") or ""
+        label = ", ".join([x for x in [display, admin1, country] if x]).strip()
+        self.cache.set(f"om_label:{qk}", label, ttl_seconds=7 * 24 * 3600)
+        self.cache.set(f"geo_ll:{qk}", (lat, lon), ttl_seconds=7 * 24 * 3600)
+        return lat, lon, label
 
     async def _forecast_open_meteo(self, lat: float, lon: float) -> dict:
-        cache_key = f"om_fc:{lat:.4f},{lon:.4f}"
+        # ~1 km grid: Open-Meteo's model cells are coarser anyway, so nearby geocodes share one entry
+        lat, lon = round(lat, 2), round(lon, 2)
+        cache_key = f"om_fc:{lat:.2f},{lon:.2f}"
         cached = self.cache.get(cache_key)
         if cached is not None:
             return cached
 
-        url = f"{settings.open_meteo_base_url}/forecast"
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "daily": "weathercode,temperature_2m_max,temperature_2m_min,precipitation_probability_max,windspeed_10m_max",
-            "current_weather": "true",
-            "timezone": "auto",
-            "forecast_days": 3,
-        }
-        async with httpx.AsyncClient(timeout=20) as client:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            data = r.json()
-            self.cache.set(cache_key, data, ttl_seconds=1800)
-            return data
+        url = f"{settings.open_meteo_base_url}/forecast?latitude={lat}&longitude={lon}&{_FORECAST_QUERY}"
+        r = await get_client().get(url, timeout=20)
+        r.raise_for_status()
+        data = orjson.loads(r.content)
+        self.cache.set(cache_key, data, ttl_seconds=1800)
+        return data
 
     @staticmethod
     def _pick_day(daily: dict, idx: int = 0) -> dict:
@@ -114,7 +123,9 @@ class WeatherAgent:
     def _ru_desc(code: Optional[int]) -> str:
         if code is None:
             return "нет данных"
-        return _WEATHER_CODE_RU.get(int(code), f"код {code}")
+        if type(code) is not int:  # Open-Meteo sends ints; cast only odd inputs ("3", 3.0)
+            code = int(code)
+        return _WEATHER_CODE_RU.get(code, f"код {code}")
 
     async def run(self, country: str | None, city: str | None) -> WeatherResult:
         place = ", ".join([p for p in [city, country] if p]).strip()
@@ -1,29 +1,158 @@
 from __future__ import annotations
+import asyncio
+import functools
+import heapq
+import os
+import pickle
+import sqlite3
+import threading
 import time
-from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Короткий TTL для отрицательных результатов (опечатка в городе, ошибка OSRM):
+# защищает апстрим от повторов, но быстро даёт шанс исправиться
+NEGATIVE_TTL_SECONDS = 300
+
+class _Negative:
+    """Маркер закэшированного «ничего не найдено» (None в кэше неотличим от промаха)."""
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "NEGATIVE"
+
+    def __reduce__(self):
+        # при (де)сериализации остаётся тем же синглтоном
+        return "NEGATIVE"
+
+NEGATIVE = _Negative()
 
 class TTLCache:
-    """Простой in-memory TTL кэш для MVP."""
+    """Простой in-memory TTL кэш для MVP (LRU-вытеснение, O(1) на операцию)."""
 
     def __init__(self, default_ttl_seconds: int = 900, max_items: int = 5000):
         self.default_ttl = default_ttl_seconds
         self.max_items = max_items
-        self._store: Dict[str, Tuple[float, Any]] = {}
+        self._store: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # min-heap (expires_at, key) для ленивой очистки протухших записей
+        self._expiry: List[Tuple[float, str]] = []
+
+    def _purge_expired(self, now: float) -> None:
+        heap = self._expiry
+        while heap and heap[0][0] < now:
+            expires_at, key = heapq.heappop(heap)
+            item = self._store.get(key)
+            # запись могла быть перезаписана с новым сроком — тогда в куче устаревший хвост
+            if item is not None and item[0] == expires_at:
+                del self._store[key]
 
     def get(self, key: str) -> Optional[Any]:
         item = self._store.get(key)
-        if not item:
+        if item is None:
             return None
         expires_at, value = item
         if expires_at < time.time():
             self._store.pop(key, None)
             return None
+        self._store.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        now = time.time()
+        self._purge_expired(now)
+        if key in self._store:
+            self._store.move_to_end(key)
+        elif len(self._store) >= self.max_items:
+            # вытесняем давно не использованную запись
+            self._store.popitem(last=False)
+        ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl
+        expires_at = now + ttl
+        self._store[key] = (expires_at, value)
+        heapq.heappush(self._expiry, (expires_at, key))
+        if len(self._expiry) > 2 * self.max_items:
+            self._expiry = [(exp, k) for k, (exp, _) in self._store.items()]
+            heapq.heapify(self._expiry)
+
+class PersistentTTLCache(TTLCache):
+    """TTLCache с SQLite-хранилищем (L2): переживает рестарт бота.
+
+    L1 — обычный in-memory кэш; промах в L1 читается из SQLite и прогревает L1.
+    Значения сериализуются pickle — файл кэша должен быть доступен на запись только боту.
+    """
+
+    _PURGE_EVERY = 500
+    # версия формата значений: поднять при изменении кэшируемых классов (WikiPage, модели и т.п.)
+    # — при несовпадении с PRAGMA user_version старая таблица удаляется при открытии
+    _SCHEMA_VERSION = 1
+
+    def __init__(self, path: str, default_ttl_seconds: int = 900, max_items: int = 5000):
+        super().__init__(default_ttl_seconds=default_ttl_seconds, max_items=max_items)
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != self._SCHEMA_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS cache")
+            self._db.execute(f"PRAGMA user_version = {int(self._SCHEMA_VERSION)}")
+        self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires REAL, value BLOB)")
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = super().get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            row = self._db.execute("SELECT expires, value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        expires_at, blob = row
+        ttl = expires_at - time.time()
+        if ttl <= 0:
+            return None
+        try:
+            value = pickle.loads(blob)
+        except Exception:
+            # битая строка или класс изменился после деплоя: удаляем и считаем промахом
+            with self._lock:
+                self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return None
+        super().set(key, value, ttl_seconds=ttl)
         return value
 
     def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
-        if len(self._store) >= self.max_items:
-            # простейшая очистка: удалить 10% случайных/первых ключей
-            for k in list(self._store.keys())[: max(1, self.max_items // 10)]:
-                self._store.pop(k, None)
+        super().set(key, value, ttl_seconds)
         ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl
-        self._store[key] = (time.time() + ttl, value)
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO cache (key, expires, value) VALUES (?, ?, ?)", (key, now + ttl, blob))
+            self._writes += 1
+            if self._writes % self._PURGE_EVERY == 0:
+                self._db.execute("DELETE FROM cache WHERE expires < ?", (now,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+class SingleFlight:
+    """Склеивает одновременные одинаковые запросы: пока запрос по ключу в полёте,
+    остальные вызывающие ждут его результат, а не идут в апстрим сами."""
+
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            # отдельная задача: отмена одного ожидающего (таймаут) не отменяет запрос для остальных
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: "asyncio.Future[Any]") -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # помечаем ошибку как полученную, даже если все ожидающие ушли
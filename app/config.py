@@ -1,10 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
 class Settings(BaseModel):
+    # env is read once at import; the instance is immutable (and hashable) afterwards
+    model_config = ConfigDict(frozen=True)
+
     telegram_bot_token: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
     gigachat_credentials: str = os.getenv("GIGACHAT_CREDENTIALS", "")
     gigachat_verify_ssl_certs: bool = os.getenv("GIGACHAT_VERIFY_SSL_CERTS", "false").lower() == "true"
@@ -17,4 +20,26 @@ class Settings(BaseModel):
     legal_chroma_dir: str = os.getenv("LEGAL_CHROMA_DIR", "./.chroma_legal")
     legal_kb_dir: str = os.getenv("LEGAL_KB_DIR", "./kb/legal")
 
+    # Extra LLM round-trip in LegalAgent when the first answer has empty lists (debug/quality A/B)
+    legal_second_pass: bool = os.getenv("LEGAL_SECOND_PASS", "false").lower() == "true"
+
+    # Output-token caps per agent (generation time grows ~linearly with output tokens)
+    router_max_tokens: int = int(os.getenv("ROUTER_MAX_TOKENS", "400"))
+    tourist_max_tokens: int = int(os.getenv("TOURIST_MAX_TOKENS", "1800"))
+    legal_max_tokens: int = int(os.getenv("LEGAL_MAX_TOKENS", "1400"))
+    summary_max_tokens: int = int(os.getenv("SUMMARY_MAX_TOKENS", "220"))
+
+    # Max in-flight GigaChat requests per process (protects the API rate limit under fan-out)
+    gigachat_max_concurrency: int = int(os.getenv("GIGACHAT_MAX_CONCURRENCY", "4"))
+
+    # SQLite file backing geocode/route/forecast caches across restarts (opt-in; empty = memory only)
+    cache_db_path: str = os.getenv("CACHE_DB_PATH", "")
+
+    # Parsed router/tourist answers are cached; bump LLM_CACHE_VERSION to drop old entries
+    llm_cache_ttl_s: int = int(os.getenv("LLM_CACHE_TTL_S", str(3 * 3600)))
+    llm_cache_version: str = os.getenv("LLM_CACHE_VERSION", "1")
+
+    # Per-agent deadline so one slow agent doesn't stall the whole answer
+    agent_timeout_s: float = float(os.getenv("AGENT_TIMEOUT_S", "90"))
+
 settings = Settings()
@@ -1,9 +1,22 @@
 from __future__ import annotations
 from dataclasses import dataclass
+import asyncio
 from typing import Optional
 import httpx
+import orjson
 
-@dataclass
+from ..cache import NEGATIVE, NEGATIVE_TTL_SECONDS, SingleFlight, TTLCache
+from ..http_client import get_client
+
+# Wikipedia intros/thumbnails change rarely; popular cities/landmarks repeat across users
+_WIKI_TTL_SECONDS = 7 * 24 * 3600
+_MAX_CONCURRENT_REQUESTS = 5
+
+def _json(r: httpx.Response):
+    # orjson parses the bytes directly (no str decode step), 2-5x faster on extract payloads
+    return orjson.loads(r.content) if r.content else None
+
+@dataclass(slots=True)
 class WikiPage:
     title: str
     extract: str = ""
@@ -14,14 +27,35 @@ class WikiEnricher:
     Wikipedia helper (no keys):
     - search page title (MediaWiki API)
     - get intro extract + thumbnail via MediaWiki API (more Telegram-friendly than REST thumbnails)
+    - enrich_one: both in a single generator=search request
     """
-    def __init__(self):
+    def __init__(self, cache: TTLCache | None = None):
         self._headers = {"User-Agent": "shishki-travel-bot/1.0"}
+        self.cache = cache or TTLCache(default_ttl_seconds=_WIKI_TTL_SECONDS)
+        # cap in-flight Wikipedia requests: an 11-way POI fan-out per user invites 429s
+        self._sem = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+        self._flight = SingleFlight()
+
+    async def _get(self, url: str, params: dict) -> httpx.Response:
+        async with self._sem:
+            r = await get_client().get(url, params=params, headers=self._headers, timeout=20)
+        r.raise_for_status()
+        return r
+
+    @staticmethod
+    def _page_key(title: str, lang: str, sentences: int, thumb_px: int) -> str:
+        return f"wiki_p:{lang}:{sentences}:{thumb_px}:{title}"
 
     async def search_title(self, query: str, lang: str = "en") -> Optional[str]:
         q = (query or "").strip()
         if not q:
             return None
+        cache_key = f"wiki_s:{lang}:{q.casefold()}"
+        cached = self.cache.get(cache_key)
+        if cached is NEGATIVE:
+            return None
+        if cached is not None:
+            return cached
         url = f"https://{lang}.wikipedia.org/w/api.php"
         params = {
             "action": "query",
@@ -30,17 +64,24 @@ class WikiEnricher:
             "format": "json",
             "srlimit": 1,
         }
-        async with httpx.AsyncClient(timeout=20, headers=self._headers) as client:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            hits = (((r.json() or {}).get("query") or {}).get("search") or [])
-            return hits[0].get("title") if hits else None
+        r = await self._get(url, params)
+        hits = (((_json(r) or {}).get("query") or {}).get("search") or [])
+        title = hits[0].get("title") if hits else None
+        if title:
+            self.cache.set(cache_key, title, ttl_seconds=_WIKI_TTL_SECONDS)
+        else:
+            self.cache.set(cache_key, NEGATIVE, ttl_seconds=NEGATIVE_TTL_SECONDS)
+        return title
 
     async def page_intro(self, title: str, lang: str = "en", sentences: int = 5, thumb_px: int = 1200) -> WikiPage:
         """
         Uses prop=extracts + prop=pageimages to get plain text extract and a thumbnail URL.
         Usually returns jpg/png thumbnails (better for Telegram than REST which often returns webp).
         """
+        cache_key = self._page_key(title, lang, sentences, thumb_px)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
         url = f"https://{lang}.wikipedia.org/w/api.php"
         params = {
             "action": "query",
@@ -54,23 +95,68 @@ class WikiEnricher:
             "format": "json",
             "formatversion": 2,
         }
-        async with httpx.AsyncClient(timeout=20, headers=self._headers) as client:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            data = r.json() or {}
-            pages = (data.get("query") or {}).get("pages") or []
-            if not pages:
-                return WikiPage(title=title)
-            p0 = pages[0] or {}
-            extract = (p0.get("extract") or "").strip() if isinstance(p0, dict) else ""
-            thumb = ((p0.get("thumbnail") or {}).get("source")) if isinstance(p0, dict) else None
-            return WikiPage(title=p0.get("title") or title, extract=extract, thumbnail_url=thumb)
+        r = await self._get(url, params)
+        data = _json(r) or {}
+        pages = (data.get("query") or {}).get("pages") or []
+        if not pages:
+            return WikiPage(title=title)
+        p0 = pages[0] or {}
+        extract = (p0.get("extract") or "").strip() if isinstance(p0, dict) else ""
+        thumb = ((p0.get("thumbnail") or {}).get("source")) if isinstance(p0, dict) else None
+        page = WikiPage(title=p0.get("title") or title, extract=extract, thumbnail_url=thumb)
+        self.cache.set(cache_key, page, ttl_seconds=_WIKI_TTL_SECONDS)
+        return page
 
-    async def enrich(self, query: str, lang: str = "en", sentences: int = 5) -> Optional[WikiPage]:
-        title = await self.search_title(query, lang=lang)
-        if not title:
+    async def enrich_one(self, query: str, lang: str = "en", sentences: int = 5, thumb_px: int = 1200) -> Optional[WikiPage]:
+        """
+        Search + intro extract + thumbnail in ONE request (generator=search feeds the
+        best hit straight into prop=extracts|pageimages).
+        """
+        q = (query or "").strip()
+        if not q:
+            return None
+        cache_key = f"wiki_e:{lang}:{sentences}:{thumb_px}:{q.casefold()}"
+        cached = self.cache.get(cache_key)
+        if cached is NEGATIVE:
+            return None
+        if cached is not None:
+            return cached
+        # many users planning the same city ask for the same landmarks at the same time
+        return await self._flight.do(cache_key, lambda: self._fetch_one(q, cache_key, lang, sentences, thumb_px))
+
+    async def _fetch_one(self, q: str, cache_key: str, lang: str, sentences: int, thumb_px: int) -> Optional[WikiPage]:
+        url = f"https://{lang}.wikipedia.org/w/api.php"
+        params = {
+            "action": "query",
+            "generator": "search",
+            "gsrsearch": q,
+            "gsrlimit": 1,
+            "prop": "extracts|pageimages",
+            "explaintext": 1,
+            "exintro": 1,
+            "exsentences": sentences,
+            "piprop": "thumbnail",
+            "pithumbsize": thumb_px,
+            "format": "json",
+            "formatversion": 2,
+        }
+        r = await self._get(url, params)
+        pages = ((_json(r) or {}).get("query") or {}).get("pages") or []
+        p0 = pages[0] if pages and isinstance(pages[0], dict) else None
+        if not p0 or not p0.get("title"):
+            self.cache.set(cache_key, NEGATIVE, ttl_seconds=NEGATIVE_TTL_SECONDS)
             return None
+        page = WikiPage(
+            title=p0["title"],
+            extract=(p0.get("extract") or "").strip(),
+            thumbnail_url=(p0.get("thumbnail") or {}).get("source"),
+        )
+        self.cache.set(cache_key, page, ttl_seconds=_WIKI_TTL_SECONDS)
+        return page
+
+    async def enrich(self, query: str, lang: str = "en", sentences: int = 5) -> Optional[WikiPage]:
+        """Compatibility shim: same result as search_title + page_intro, one round-trip."""
         try:
-            return await self.page_intro(title, lang=lang, sentences=sentences)
+            return await self.enrich_one(query, lang=lang, sentences=sentences)
         except Exception:
             return None
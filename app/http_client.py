@@ -0,0 +1,23 @@
+from __future__ import annotations
+from typing import Optional
+import httpx
+
+_client: Optional[httpx.AsyncClient] = None
+
+def get_client() -> httpx.AsyncClient:
+    """Process-wide pooled HTTP client: keep-alive connections are reused across calls
+    instead of paying TCP+TLS setup on every request. Per-call headers/timeouts are
+    passed to .get() by the callers."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=20,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60),
+        )
+    return _client
+
+async def aclose_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
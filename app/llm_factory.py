@@ -1,8 +1,31 @@
-from langchain_gigachat.chat_models import GigaChat
-from langchain_gigachat.embeddings import GigaChatEmbeddings
+from __future__ import annotations
+import asyncio
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional
 from .config import settings
 
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from langchain_gigachat.chat_models import GigaChat
+    from langchain_gigachat.embeddings import GigaChatEmbeddings
+
+_llm_slots: Optional[asyncio.Semaphore] = None
+
+async def ainvoke_bounded(llm: GigaChat, messages: List[BaseMessage]) -> BaseMessage:
+    """llm.ainvoke limited to GIGACHAT_MAX_CONCURRENCY in-flight calls per process."""
+    global _llm_slots
+    if _llm_slots is None:
+        _llm_slots = asyncio.Semaphore(max(1, settings.gigachat_max_concurrency))
+    async with _llm_slots:
+        return await llm.ainvoke(messages)
+
+# One client per configuration: its HTTP connection pool and OAuth token are reused
+# by every agent/index asking for the same settings instead of being set up again
+@lru_cache(maxsize=None)
 def make_llm(temperature: float = 0.2, max_tokens: int = 1200) -> GigaChat:
+    # imported on first use: modules that only render/enrich don't pay for the GigaChat SDK
+    from langchain_gigachat.chat_models import GigaChat
+
     return GigaChat(
         credentials=settings.gigachat_credentials,
         verify_ssl_certs=settings.gigachat_verify_ssl_certs,
@@ -10,7 +33,10 @@ def make_llm(temperature: float = 0.2, max_tokens: int = 1200) -> GigaChat:
         max_tokens=max_tokens,
     )
 
+@lru_cache(maxsize=None)
 def make_embeddings() -> GigaChatEmbeddings:
+    from langchain_gigachat.embeddings import GigaChatEmbeddings
+
     return GigaChatEmbeddings(
         credentials=settings.gigachat_credentials,
         verify_ssl_certs=settings.gigachat_verify_ssl_certs,
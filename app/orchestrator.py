@@ -1,9 +1,14 @@
 import asyncio
-from typing import List, Optional
+import functools
+import itertools
+from functools import lru_cache
+from typing import Any, Awaitable, Dict, List, Optional, Sequence, Set
 import urllib.parse
 
+from .config import settings
+from .cache import PersistentTTLCache, TTLCache
 from .state import UserState
-from .models import FinalBundle, RouteResult, TourismResult, TourismPlace
+from .models import FinalBundle, RouteDecision, RouteResult, TourismResult, TourismPlace
 from .renderer import render_bundle
 from .agents.router_agent import RouterAgent
 from .agents.tourist_agent import TouristAgent
@@ -12,8 +17,71 @@ from .agents.weather_agent import WeatherAgent
 from .agents.route_agent import RouteAgent
 from .agents.summary_agent import SummaryAgent
 from .route_builder import POIRouteBuilder, GeoPoint
-from .enrichment.wiki_enricher import WikiEnricher
-
+from .enrichment.wiki_enricher import WikiEnricher, WikiPage
+
+# Assistant turns are full rendered answers (up to several KB of HTML); the memory
+# summary only needs their gist, so keep prompt tokens bounded.
+_SUMMARY_ASSISTANT_CHARS = 400
+
+def _recent_for_summary(history: Sequence[dict]) -> str:
+    lines: List[str] = []
+    for h in itertools.islice(history, max(0, len(history) - 6), None):
+        text = h["text"]
+        if h["role"] == "assistant" and len(text) > _SUMMARY_ASSISTANT_CHARS:
+            text = text[:_SUMMARY_ASSISTANT_CHARS] + "…"
+        lines.append(f"{h['role']}: {text}")
+    return "\n".join(lines)
+
+def _http_cache(default_ttl_seconds: int) -> TTLCache:
+    # Geocodes/routes/forecasts are pure functions of the query: keep them across restarts
+    if settings.cache_db_path:
+        return PersistentTTLCache(settings.cache_db_path, default_ttl_seconds=default_ttl_seconds)
+    return TTLCache(default_ttl_seconds=default_ttl_seconds)
+
+_PLACE_NEEDS = frozenset({"tourism", "legal"})
+
+def _forced_decision(
+    user_text: str,
+    state: UserState,
+    forced_needs: Optional[List[str]],
+    forced_start: Optional[str],
+    forced_end: Optional[str],
+) -> Optional[RouteDecision]:
+    """RouteDecision without the router LLM when buttons already decided everything.
+
+    - menu button ("Покажи tourism") with a known destination: nothing to extract;
+    - explicit "A -> B" route points: start/end/needs are all forced.
+    Anything else (free text) still goes through RouterAgent.
+    """
+    if not forced_needs:
+        return None
+    has_destination = bool((state.city or "").strip() or (state.country or "").strip())
+    button_click = user_text.startswith("Покажи ") and has_destination
+    route_points = bool(forced_start and forced_end)
+    if not (button_click or route_points):
+        return None
+    return RouteDecision(needs=list(forced_needs), user_question=user_text)
+
+# How long the answer waits for POI Wikipedia cards before replying without the stragglers
+_POI_ENRICH_WAIT_S = 0.8
+
+def _apply_wiki(p: TourismPlace, task: "asyncio.Future[Optional[WikiPage]]") -> None:
+    if task.cancelled() or task.exception() is not None:
+        return
+    wp = task.result()
+    if wp:
+        if wp.extract and not p.summary:
+            p.summary = wp.extract[:500]
+        if wp.thumbnail_url and not p.image_url:
+            p.image_url = wp.thumbnail_url
+
+def _apply_wiki_late(p: TourismPlace, item: dict, task: "asyncio.Future[Optional[WikiPage]]") -> None:
+    # straggler finished after the answer was sent: update the button's item in place
+    _apply_wiki(p, task)
+    item["summary"] = p.summary
+    item["image_url"] = p.image_url
+
+@lru_cache(maxsize=1024)
 def google_maps_search_url(q: str) -> str:
     return "https://www.google.com/maps/search/?api=1&query=" + urllib.parse.quote_plus(q)
 
@@ -33,16 +101,45 @@ class Orchestrator:
         self.router = RouterAgent()
         self.tourist = TouristAgent()
         self.legal = LegalAgent()
-        self.weather = WeatherAgent()
-        self.route = RouteAgent()
+        # Route, POI and weather geocodes share `geo_ll:{query}` -> (lat, lon): a place looked up
+        # for one of them is a cache hit for the others (misses stay per geocoder)
+        geo_cache = _http_cache(7 * 24 * 3600)
+        self.weather = WeatherAgent(cache=geo_cache)
+        self.route = RouteAgent(cache=geo_cache)
         self.summary_agent = SummaryAgent()
-        self.poi_builder = POIRouteBuilder()
-        self.wiki = WikiEnricher()
+        self.poi_builder = POIRouteBuilder(cache=geo_cache)
+        self.wiki = WikiEnricher(cache=_http_cache(7 * 24 * 3600))
+        # Wiki lookups still loading after the reply was sent, keyed by id(state): keeps them
+        # referenced until done and lets the user's next message cancel them.
+        self._wiki_bg: Dict[int, Set[asyncio.Future]] = {}
+
+    def _cancel_wiki_bg(self, state: UserState) -> None:
+        for task in self._wiki_bg.pop(id(state), ()):
+            task.cancel()
+
+    def _track_wiki_bg(self, state: UserState, task: asyncio.Future) -> None:
+        key = id(state)
+        bg = self._wiki_bg.setdefault(key, set())
+        bg.add(task)
+
+        def _done(t: asyncio.Future) -> None:
+            bg.discard(t)
+            if not bg and self._wiki_bg.get(key) is bg:
+                del self._wiki_bg[key]
 
-    async def _enrich_tourism(self, t: TourismResult, city: str | None, country: str | None, state: UserState) -> None:
+        task.add_done_callback(_done)
+
+    async def _enrich_tourism(
+        self,
+        t: TourismResult,
+        city: str | None,
+        country: str | None,
+        state: UserState,
+        city_page: Optional[Awaitable[Optional[WikiPage]]] = None,
+    ) -> None:
         """
         Enrichment without LLM:
-        - city photo via Wikipedia (if found)
+        - city photo via Wikipedia (if found; city_page may be prefetched by the caller)
         - for POIs: maps_url + (optional) wiki summary + image
         - store POIs into state.poi_items so we can show interactive buttons
         """
@@ -56,7 +153,10 @@ class Orchestrator:
 
         # City photo (one media card only)
         if cc:
-            wp_city = await self.wiki.enrich(cc, lang="en", sentences=2)
+            try:
+                wp_city = await (city_page or self.wiki.enrich(cc, lang="en", sentences=2))
+            except Exception:
+                wp_city = None
             if wp_city and wp_city.thumbnail_url:
                 t.city_image_url = wp_city.thumbnail_url
                 state.media_queue.append({
@@ -66,16 +166,6 @@ class Orchestrator:
                     "buttons": [("📍 Открыть на карте", google_maps_search_url(cc))]
                 })
 
-        async def enrich_place(p: TourismPlace) -> None:
-            q = (p.query or "").strip() or (f"{p.name}, {cc}" if cc else p.name)
-            p.maps_url = google_maps_search_url(q)
-            wp = await self.wiki.enrich(q, lang="en", sentences=6)
-            if wp:
-                if wp.extract and not p.summary:
-                    p.summary = wp.extract[:500]
-                if wp.thumbnail_url and not p.image_url:
-                    p.image_url = wp.thumbnail_url
-
         # always add maps_url for food spots (no photos)
         for f in t.food_spots:
             q = (f.query or "").strip() or (f"{f.name}, {cc}" if cc else f.name)
@@ -87,13 +177,30 @@ class Orchestrator:
                 "query": f.query,
             })
 
-        # Enrich top places concurrently
+        # Enrich top places: maps links up front, then one concurrent Wikipedia request per place.
+        # The answer text doesn't use wiki data (it's shown on POI button click), so wait only
+        # briefly: slow pages keep loading and fill their button item in the background.
         top = t.highlights[:10]
-        await asyncio.gather(*[enrich_place(p) for p in top], return_exceptions=True)
+        queries = [(p.query or "").strip() or (f"{p.name}, {cc}" if cc else p.name) for p in top]
+        maps_urls = [google_maps_search_url(q) for q in queries]
+        for p, url in zip(top, maps_urls):
+            p.maps_url = url
+        tasks = [asyncio.ensure_future(self.wiki.enrich(q, lang="en", sentences=6)) for q in queries]
+        pending = set()
+        if tasks:
+            try:
+                _, pending = await asyncio.wait(tasks, timeout=_POI_ENRICH_WAIT_S)
+            except BaseException:
+                # tourism timed out / was cancelled: nobody will read these results
+                for task in tasks:
+                    task.cancel()
+                raise
 
         # Store POIs for interactive buttons (top 10)
-        for p in t.highlights[:10]:
-            state.poi_items.append({
+        for p, task in zip(top, tasks):
+            if task not in pending:
+                _apply_wiki(p, task)
+            item = {
                 "name": p.name,
                 "why": p.why,
                 "time_needed": p.time_needed,
@@ -101,7 +208,32 @@ class Orchestrator:
                 "image_url": p.image_url,
                 "maps_url": p.maps_url,
                 "query": p.query,
-            })
+            }
+            state.poi_items.append(item)
+            if task in pending:
+                task.add_done_callback(functools.partial(_apply_wiki_late, p, item))
+                self._track_wiki_bg(state, task)
+
+    @staticmethod
+    async def _with_timeout(aw: Awaitable[Any]) -> Any:
+        return await asyncio.wait_for(aw, timeout=settings.agent_timeout_s)
+
+    async def _run_tourism(self, decision: RouteDecision, user_text: str, state: UserState) -> TourismResult:
+        # City photo doesn't depend on the LLM answer: fetch it while the tourist agent is thinking
+        cc = ", ".join([x for x in [decision.city, decision.country] if x]).strip()
+        city_page = asyncio.ensure_future(self.wiki.enrich(cc, lang="en", sentences=2)) if cc else None
+        try:
+            t = await self.tourist.arun(
+                decision.country, decision.city, decision.dates,
+                decision.user_question or user_text,
+                summary=state.summary,
+            )
+        except BaseException:
+            if city_page:
+                city_page.cancel()
+            raise
+        await self._enrich_tourism(t, decision.city, decision.country, state, city_page=city_page)
+        return t
 
     async def handle(
         self,
@@ -115,16 +247,19 @@ class Orchestrator:
         state.last_origin = None
         state.last_dest = None
         state.media_queue = []
+        self._cancel_wiki_bg(state)
         state.poi_items = []
         state.food_items = []
 
-        memory_hint = f"summary={state.summary}; country={state.country}; city={state.city}; dates={state.dates}"
-        decision = self.router.decide(user_text, memory_hint=memory_hint)
+        decision = _forced_decision(user_text, state, forced_needs, forced_start, forced_end)
+        if decision is None:
+            memory_hint = f"summary={state.summary}; country={state.country}; city={state.city}; dates={state.dates}"
+            decision = await self.router.adecide(user_text, memory_hint=memory_hint)
         if forced_needs:
             decision.needs = forced_needs
 
         # Weather is shown only when user presses the Weather button.
-        allow_weather = bool(forced_needs) and ("weather" in (forced_needs or []))
+        allow_weather = bool(forced_needs) and "weather" in forced_needs
 
         decision.country = decision.country or state.country
         decision.city = decision.city or state.city
@@ -140,50 +275,38 @@ class Orchestrator:
         if decision.end_location:
             state.end_location = decision.end_location
 
-        tourism_res = None
-        legal_res = None
-        weather_res = None
-        route_res: RouteResult | None = None
-
-        if "tourism" in decision.needs:
-            try:
-                tourism_res = self.tourist.run(
-                    decision.country, decision.city, decision.dates,
-                    decision.user_question or user_text,
-                    summary=state.summary,
-                )
-                await self._enrich_tourism(tourism_res, decision.city, decision.country, state)
-            except Exception:
-                tourism_res = None
-
-        if "legal" in decision.needs:
-            try:
-                legal_res = self.legal.run(decision.country, decision.city, decision.user_question or user_text)
-            except Exception:
-                legal_res = None
-
-        tasks = []
-        if allow_weather and "weather" in decision.needs:
-            tasks.append(asyncio.create_task(self.weather.run(decision.country, decision.city)))
-
-        want_route = "route" in decision.needs
+        needs = frozenset(decision.needs or ())
+        want_route = "route" in needs
         route_mode_poi = want_route and not decision.start_location and not decision.end_location
 
+        # Tourism/legal/weather answers are about a place: without one the LLM calls
+        # would only produce generic filler, so skip them and ask for the destination
+        has_destination = bool(decision.city or decision.country)
+        want_weather = allow_weather and "weather" in needs
+        needs_destination = bool(needs & _PLACE_NEEDS) or want_weather
+
+        # Independent agents run concurrently: latency ~ max(agent) instead of sum(agent)
+        tasks: Dict[str, Awaitable[Any]] = {}
+        if "tourism" in needs and has_destination:
+            tasks["tourism"] = self._run_tourism(decision, user_text, state)
+        if "legal" in needs and has_destination:
+            tasks["legal"] = self.legal.arun(decision.country, decision.city, decision.user_question or user_text)
+        if want_weather and has_destination:
+            tasks["weather"] = self.weather.run(decision.country, decision.city)
         if want_route and not route_mode_poi:
             a = decision.start_location or f"{decision.city or ''} {decision.country or ''}".strip()
             b = decision.end_location or "центр города"
-            tasks.append(asyncio.create_task(self.route.run(a, b)))
+            tasks["route"] = self.route.run(a, b)
 
+        results: Dict[str, Any] = {}
         if tasks:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            idx = 0
-            if allow_weather and "weather" in decision.needs:
-                if not isinstance(results[idx], Exception):
-                    weather_res = results[idx]
-                idx += 1
-            if want_route and not route_mode_poi:
-                if not isinstance(results[idx], Exception):
-                    route_res = results[idx]
+            done = await asyncio.gather(*[self._with_timeout(t) for t in tasks.values()], return_exceptions=True)
+            results = {k: v for k, v in zip(tasks.keys(), done) if not isinstance(v, BaseException)}
+
+        tourism_res = results.get("tourism")
+        legal_res = results.get("legal")
+        weather_res = results.get("weather")
+        route_res: RouteResult | None = results.get("route")
 
         # POI route from tourist plan/highlights (only if asked "route" and no A->B)
         if route_mode_poi and tourism_res and tourism_res.highlights:
@@ -191,35 +314,30 @@ class Orchestrator:
             if not names:
                 names = [p.name for p in tourism_res.highlights[:7]]
 
-            queries = []
-            for p in tourism_res.highlights:
-                if p.query:
-                    queries.append((p.name, p.query))
+            # reversed: on duplicate names the first highlight wins, as with the old linear scan
+            name_to_query = {p.name.lower(): p.query for p in reversed(tourism_res.highlights) if p.query}
+            cc2 = ", ".join([x for x in [decision.city, decision.country] if x])
 
             def q_for(name: str) -> str:
-                cc2 = ", ".join([x for x in [decision.city, decision.country] if x])
                 return f"{name}, {cc2}" if cc2 else name
 
-            chosen = names[:8]
-            geo_points: List[GeoPoint] = []
-            for nm in chosen:
-                q = None
-                for (n0, q0) in queries:
-                    if n0.lower() == nm.lower():
-                        q = q0
-                        break
-                q = q or q_for(nm)
+            # plan lines often revisit a place: geocode each name once (order preserved)
+            chosen = list(dict.fromkeys(names))[:8]
+
+            async def geo(nm: str) -> Optional[GeoPoint]:
                 try:
-                    ll = await self.poi_builder.geocode(q)
-                    if ll:
-                        geo_points.append(GeoPoint(name=nm, lat=ll[0], lon=ll[1]))
+                    ll = await self.poi_builder.geocode(name_to_query.get(nm.lower()) or q_for(nm))
                 except Exception:
-                    continue
+                    return None
+                return GeoPoint(name=nm, lat=ll[0], lon=ll[1]) if ll else None
+
+            # concurrent lookups (POIRouteBuilder caps in-flight Nominatim requests), order kept
+            geo_points = [g for g in await asyncio.gather(*[geo(nm) for nm in chosen]) if g]
 
             if len(geo_points) >= 2:
                 ordered = self.poi_builder.order_points_nearest(geo_points)
                 maps_url = self.poi_builder.google_maps_url(ordered, travelmode="walking")
-                route_res = RouteResult(
+                route_res = RouteResult.model_construct(
                     maps_url=maps_url,
                     points=[p.name for p in ordered],
                     source="google_maps_url",
@@ -230,17 +348,20 @@ class Orchestrator:
                 # fix dest properly below
                 state.last_dest = (ordered[-1].lat, ordered[-1].lon)
             else:
-                route_res = RouteResult(notes=["Не удалось определить координаты для достаточного количества мест. Попробуй уточнить названия."], points=[])
+                route_res = RouteResult.model_construct(notes=["Не удалось определить координаты для достаточного количества мест. Попробуй уточнить названия."], points=[])
 
         if route_res and route_res.maps_url:
             state.last_route_url = route_res.maps_url
 
         dest = ", ".join([x for x in [decision.city, decision.country] if x]) or "Путешествие"
         summary_line = None
-        if ("weather" in (decision.needs or [])) and not allow_weather:
+        if needs_destination and not has_destination:
+            summary_line = "📍 Уточни город или страну — например: <i>Рим на 4 дня в январе</i>."
+        elif "weather" in needs and not allow_weather:
             summary_line = "🌦️ Прогноз погоды покажу по кнопке «Погода»."
 
-        bundle = FinalBundle(
+        # All parts are already-validated models: skip re-validation
+        bundle = FinalBundle.model_construct(
             destination_title=f"✈️ {dest}",
             tourism=tourism_res,
             legal=legal_res,
@@ -249,9 +370,9 @@ class Orchestrator:
             summary_line=summary_line,
         )
 
-        recent = "\n".join([f"{h['role']}: {h['text']}" for h in state.history[-6:]])
+        recent = _recent_for_summary(state.history)
         try:
-            new_summary = self.summary_agent.update(state.summary, recent)
+            new_summary = await self.summary_agent.aupdate(state.summary, recent, latest=user_text)
             if new_summary:
                 state.summary = new_summary
         except Exception:
@@ -1,26 +1,32 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional
+import glob
 import os
 import re
-
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_core.documents import Document
+import threading
 
 from ..llm_factory import make_embeddings
 from ..config import settings
+from ..cache import TTLCache
+
 
+_RE_NON_ALNUM = re.compile(r"[^0-9a-zа-я]+", re.IGNORECASE)
+_RE_WS = re.compile(r"\s+")
+_RE_COUNTRY_RU = re.compile(r"^\s*country_ru\s*:\s*(.+?)\s*$", re.MULTILINE | re.IGNORECASE)
+_RE_COUNTRY = re.compile(r"^\s*country\s*:\s*(.+?)\s*$", re.MULTILINE | re.IGNORECASE)
 
+
+@lru_cache(maxsize=1024)
 def _norm_country(s: str) -> str:
     """Normalize country name for exact metadata matching."""
     s = (s or "").strip().lower()
     s = s.replace("ё", "е")
     # keep letters/digits, collapse others to space
-    s = re.sub(r"[^0-9a-zа-я]+", " ", s, flags=re.IGNORECASE)
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _RE_NON_ALNUM.sub(" ", s)
+    s = _RE_WS.sub(" ", s).strip()
     return s
 
 
@@ -37,11 +43,11 @@ def _extract_country_from_text(text: str) -> Optional[str]:
     # If YAML frontmatter present, search inside first 60 lines
     head = "\n".join(text.splitlines()[:60])
 
-    m = re.search(r"^\s*country_ru\s*:\s*(.+?)\s*$", head, flags=re.MULTILINE | re.IGNORECASE)
+    m = _RE_COUNTRY_RU.search(head)
     if m:
         return m.group(1).strip().strip('"\'')
 
-    m = re.search(r"^\s*country\s*:\s*(.+?)\s*$", head, flags=re.MULTILINE | re.IGNORECASE)
+    m = _RE_COUNTRY.search(head)
     if m:
         return m.group(1).strip().strip('"\'')
 
@@ -58,24 +64,69 @@ def _country_from_source_path(source: str) -> str:
     return parts[0]
 
 
-@dataclass
+@dataclass(slots=True)
 class RetrievedChunk:
     source: str
     chunk: str
 
 
+# Must match the splitter in build_index: a country whose documents fit into k chunks
+# is fully returned by a filtered search anyway.
+_CHUNK_SIZE = 900
+_EMBED_BATCH = 96
+
+
+def _load_country_bundles(kb_dir: str) -> Dict[str, List[RetrievedChunk]]:
+    """Read kb/legal once and group whole documents by normalized country."""
+    bundles: Dict[str, List[RetrievedChunk]] = {}
+    for path in sorted(glob.glob(os.path.join(kb_dir, "**", "*.md"), recursive=True)):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            continue
+        country_norm = _norm_country(_extract_country_from_text(text) or _country_from_source_path(path))
+        if country_norm and text.strip():
+            bundles.setdefault(country_norm, []).append(RetrievedChunk(source=os.path.basename(path), chunk=text))
+    return bundles
+
+
 class LegalRAG:
-    def __init__(self, persist_dir: str | None = None):
+    def __init__(self, persist_dir: str | None = None, cache: TTLCache | None = None, kb_dir: str | None = None):
         self.persist_dir = persist_dir or settings.legal_chroma_dir
-        self.embeddings = make_embeddings()
-        self.vs = Chroma(
-            collection_name="legal_kb",
-            embedding_function=self.embeddings,
-            persist_directory=self.persist_dir,
-        )
+        # Per-country documents preloaded at startup: small countries skip embeddings + vector search
+        self.bundles = _load_country_bundles(kb_dir or settings.legal_kb_dir)
+        # KB changes only on index rebuild: skip repeated embedding RTT + vector search
+        self.cache = cache or TTLCache(default_ttl_seconds=6 * 3600)
+        # TTLCache is not thread-safe and retrieve() runs in worker threads
+        self._cache_lock = threading.Lock()
+        # Chroma handle is opened on the first real vector search: bundle-only countries
+        # never load chromadb or the embeddings client
+        self._vs = None
+        self._vs_lock = threading.Lock()
+
+    @property
+    def vs(self):
+        if self._vs is None:
+            with self._vs_lock:  # retrieve() runs in worker threads
+                if self._vs is None:
+                    from langchain_community.vectorstores import Chroma
+
+                    self._vs = Chroma(
+                        collection_name="legal_kb",
+                        embedding_function=make_embeddings(),
+                        persist_directory=self.persist_dir,
+                    )
+        return self._vs
 
     @staticmethod
     def build_index(kb_dir: str | None = None, persist_dir: str | None = None) -> None:
+        from langchain.embeddings import CacheBackedEmbeddings
+        from langchain.storage import LocalFileStore
+        from langchain_community.document_loaders import DirectoryLoader, TextLoader
+        from langchain_community.vectorstores import Chroma
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
         kb_dir = kb_dir or settings.legal_kb_dir
         persist_dir = persist_dir or settings.legal_chroma_dir
 
@@ -88,45 +139,61 @@ class LegalRAG:
         )
         docs = loader.load()
 
-        # Attach country metadata to each doc (later inherited by chunks)
-        enriched_docs: List[Document] = []
+        # Attach country metadata to each doc in place (later inherited by chunks): the
+        # loader's Documents are ours, no need to copy them and their metadata dicts
         for d in docs:
             src = d.metadata.get("source", "")
-            text = d.page_content or ""
-            country_raw = _extract_country_from_text(text) or _country_from_source_path(src)
-            country_norm = _norm_country(country_raw)
-
-            md = dict(d.metadata)
-            md["country"] = country_raw
-            md["country_norm"] = country_norm
-            enriched_docs.append(Document(page_content=text, metadata=md))
-
-        splitter = RecursiveCharacterTextSplitter(chunk_size=900, chunk_overlap=150)
-        chunks = splitter.split_documents(enriched_docs)
-
-        embeddings = make_embeddings()
-        _ = Chroma.from_documents(
-            documents=chunks,
-            embedding=embeddings,
+            country_raw = _extract_country_from_text(d.page_content or "") or _country_from_source_path(src)
+            d.metadata["country"] = country_raw
+            d.metadata["country_norm"] = _norm_country(country_raw)
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=_CHUNK_SIZE, chunk_overlap=150)
+        chunks = splitter.split_documents(docs)
+
+        # Explicit batches: one embeddings request per _EMBED_BATCH chunks instead of relying
+        # on from_documents' internal batching
+        # Content-hash embedding cache next to the index: rebuilds and boilerplate repeated
+        # across country files only pay for text that was never embedded before
+        embeddings = CacheBackedEmbeddings.from_bytes_store(
+            make_embeddings(),
+            LocalFileStore(os.path.join(persist_dir, "emb_cache")),
+            namespace="gigachat",
+        )
+        vs = Chroma(
             collection_name="legal_kb",
+            embedding_function=embeddings,
             persist_directory=persist_dir,
         )
+        texts = [c.page_content for c in chunks]
+        metadatas = [c.metadata for c in chunks]
+        for i in range(0, len(texts), _EMBED_BATCH):
+            vs.add_texts(texts[i:i + _EMBED_BATCH], metadatas=metadatas[i:i + _EMBED_BATCH])
 
     def retrieve(self, query: str, country: str | None = None, k: int = 6) -> List[RetrievedChunk]:
         """Retrieve chunks, optionally filtered to a specific country."""
+        if country:
+            bundle = self.bundles.get(_norm_country(country))
+            if bundle and sum(len(c.chunk) for c in bundle) <= k * _CHUNK_SIZE:
+                return list(bundle)
+
+        cache_key = f"rag:{k}:{_norm_country(country or '')}:{' '.join((query or '').lower().split())}"
+        with self._cache_lock:
+            cached = self.cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
         filt = None
         if country:
             filt = {"country_norm": _norm_country(country)}
 
-        # Prefer retriever with filter (LangChain docs recommend search_kwargs['filter'])
-        if filt:
-            retriever = self.vs.as_retriever(search_kwargs={"k": k, "filter": filt})
-            docs = retriever.get_relevant_documents(query)
-        else:
-            docs = self.vs.similarity_search(query, k=k)
+        # Direct store call: no retriever/Runnable/callback-manager layer per query
+        docs = self.vs.similarity_search(query, k=k, filter=filt)
 
         out: List[RetrievedChunk] = []
         for d in docs:
             src = d.metadata.get("source", "unknown")
             out.append(RetrievedChunk(source=os.path.basename(src), chunk=d.page_content))
+        if out:
+            with self._cache_lock:
+                self.cache.set(cache_key, out)
         return out
@@ -1,102 +1,105 @@
 from __future__ import annotations
 from typing import List
-from html import escape
+import html
 
 from .models import FinalBundle, TourismResult, LegalResult, WeatherResult, RouteResult
 
 TELEGRAM_LIMIT = 3800
 
-def _bullets(items: List[str]) -> str:
-    if not items:
-        return ""
-    return "\n".join([f"• {escape(x)}" for x in items if x])
+def escape(s: str) -> str:
+    # Telegram HTML needs only &, <, > escaped in text (no attributes here):
+    # skipping the two quote replacements makes this 3 C-level passes instead of 5
+    return html.escape(s, quote=False)
+
+_BULLET = "• "
+_NO_DATA = "• (нет данных)"
+
+def _bullets(items: List[str], out: List[str]) -> None:
+    out.extend([_BULLET + escape(x) for x in items if x])
 
 def _title(t: str) -> str:
     return f"<b>{escape(t)}</b>"
 
 def render_bundle(bundle: FinalBundle) -> str:
-    parts: List[str] = []
-    parts.append(_title(bundle.destination_title))
-    parts.append("────────")
+    # One flat list of lines for the whole message, joined once at the end
+    out: List[str] = [_title(bundle.destination_title), "────────"]
+    if bundle.summary_line:
+        # already Telegram HTML (built by the orchestrator, not from model output)
+        out.append(bundle.summary_line)
 
     if bundle.tourism:
-        parts.append("<b>🧭 Коротко о месте</b>")
-        parts.append(render_overview(bundle.tourism))
-        parts.append("")
-        parts.append("<b>🏛️ Что посмотреть</b>")
-        parts.append(render_highlights(bundle.tourism))
-        parts.append("")
-        parts.append("<b>🍜 Где поесть</b>")
-        parts.append(render_food(bundle.tourism))
-        parts.append("")
+        out.append("<b>🧭 Коротко о месте</b>")
+        render_overview(bundle.tourism, out)
+        out.append("<b>🏛️ Что посмотреть</b>")
+        render_highlights(bundle.tourism, out)
+        out.append("<b>🍜 Где поесть</b>")
+        render_food(bundle.tourism, out)
         # Plan is now interactive (button), keep only a hint here
-        parts.append("<b>🗓️ План на день</b>")
-        parts.append("• Нажми кнопку <b>«План на день»</b> под списком мест — пришлю подробный план и маршрут на карте.")
-        parts.append("")
-        extras = render_tourism_extras(bundle.tourism)
-        if extras:
-            parts.append(extras)
-            parts.append("")
+        out.append("<b>🗓️ План на день</b>")
+        out.append("• Нажми кнопку <b>«План на день»</b> под списком мест — пришлю подробный план и маршрут на карте.")
+        render_tourism_extras(bundle.tourism, out)
 
     if bundle.weather:
-        parts.append("<b>🌦️ Погода</b>")
-        parts.append(render_weather(bundle.weather))
-        parts.append("")
+        out.append("<b>🌦️ Погода</b>")
+        render_weather(bundle.weather, out)
 
     if bundle.route:
-        parts.append("<b>🗺️ Маршрут</b>")
-        parts.append(render_route(bundle.route))
-        parts.append("")
+        out.append("<b>🗺️ Маршрут</b>")
+        render_route(bundle.route, out)
 
     if bundle.legal:
-        parts.append("<b>⚖️ Визы и законы</b>")
-        parts.append(render_legal(bundle.legal))
-        parts.append("")
+        out.append("<b>⚖️ Визы и законы</b>")
+        render_legal(bundle.legal, out)
 
-    return "\n".join([p for p in parts if p]).strip()
+    return "\n".join([x for x in out if x]).strip()
 
-def render_overview(t: TourismResult) -> str:
-    out: List[str] = []
+def render_overview(t: TourismResult, out: List[str]) -> None:
+    if not (t.overview or t.history):
+        out.append(_NO_DATA)
+        return
     if t.overview:
         out.append(escape(t.overview))
     if t.history:
         out.append("\n<b>Коротко об истории</b>")
         out.append(escape(t.history))
-    return "\n".join(out) if out else "• (нет данных)"
 
-def render_highlights(t: TourismResult) -> str:
+def render_highlights(t: TourismResult, out: List[str]) -> None:
     # Links removed from main message (will be shown on button click)
-    out: List[str] = []
+    if not t.highlights:
+        out.append(_NO_DATA)
+        return
     for p in t.highlights[:10]:
         line = f"• <b>{escape(p.name)}</b> — {escape(p.why)}"
         if p.time_needed:
             line += f" <i>({escape(p.time_needed)})</i>"
         out.append(line)
-    return "\n".join(out) if out else "• (нет данных)"
 
-def render_food(t: TourismResult) -> str:
-    out: List[str] = []
-    for f in t.food_spots[:8]:
-        line = f"• <b>{escape(f.name)}</b> — {escape(f.why)}"
-        out.append(line)
-    if not out and t.food:
-        return _bullets(t.food)
-    return "\n".join(out) if out else "• (нет данных)"
-
-def render_tourism_extras(t: TourismResult) -> str:
-    out: List[str] = []
-    if t.areas:
-        out.append("<b>📍 Районы</b>\n" + _bullets(t.areas))
-    if t.etiquette:
-        out.append("<b>🤝 Этикет</b>\n" + _bullets(t.etiquette))
-    if t.tips:
-        out.append("<b>💡 Советы</b>\n" + _bullets(t.tips))
-    if t.questions_to_clarify:
-        out.append("<b>❓ Что уточнить</b>\n" + _bullets(t.questions_to_clarify[:4]))
-    return "\n\n".join([x for x in out if x])
-
-def render_legal(l: LegalResult) -> str:
-    out: List[str] = []
+def render_food(t: TourismResult, out: List[str]) -> None:
+    if t.food_spots:
+        for f in t.food_spots[:8]:
+            out.append(f"• <b>{escape(f.name)}</b> — {escape(f.why)}")
+    elif t.food:
+        _bullets(t.food, out)
+    else:
+        out.append(_NO_DATA)
+
+def render_tourism_extras(t: TourismResult, out: List[str]) -> None:
+    if not (t.areas or t.etiquette or t.tips or t.questions_to_clarify):
+        return
+    # blocks are separated by a blank line
+    sep = ""
+    for header, items in (
+        ("<b>📍 Районы</b>", t.areas),
+        ("<b>🤝 Этикет</b>", t.etiquette),
+        ("<b>💡 Советы</b>", t.tips),
+        ("<b>❓ Что уточнить</b>", t.questions_to_clarify[:4]),
+    ):
+        if items:
+            out.append(sep + header)
+            _bullets(items, out)
+            sep = "\n"
+
+def render_legal(l: LegalResult, out: List[str]) -> None:
     if l.missing_info:
         out.append(f"⚠️ {escape(l.missing_info)}")
 
@@ -107,21 +110,20 @@ def render_legal(l: LegalResult) -> str:
     else:
         out.append("Виза: <b>нет точных данных в базе</b>")
 
-    if l.visa:
-        out.append("\n<b>Визы</b>\n" + _bullets(l.visa))
-    if l.entry_and_registration:
-        out.append("\n<b>Въезд / регистрация</b>\n" + _bullets(l.entry_and_registration))
-    if l.prohibitions_and_fines:
-        out.append("\n<b>Запреты / штрафы</b>\n" + _bullets(l.prohibitions_and_fines))
-    if l.recommendations:
-        out.append("\n<b>Рекомендации</b>\n" + _bullets(l.recommendations))
-    if l.sources:
-        out.append("\n<b>Источники (локальная база)</b>\n" + _bullets([str(s) for s in l.sources]))
-
-    return "\n".join([x for x in out if x])
-
-def render_weather(w: WeatherResult) -> str:
-    out = []
+    for header, items in (
+        ("\n<b>Визы</b>", l.visa),
+        ("\n<b>Въезд / регистрация</b>", l.entry_and_registration),
+        ("\n<b>Запреты / штрафы</b>", l.prohibitions_and_fines),
+        ("\n<b>Рекомендации</b>", l.recommendations),
+        ("\n<b>Источники (локальная база)</b>", [str(s) for s in l.sources]),
+    ):
+        if items:
+            out.append(header)
+            _bullets(items, out)
+
+def render_weather(w: WeatherResult, out: List[str]) -> None:
+    if not (w.place or w.summary or w.advice) and w.now_temp_c is None and w.feels_like_c is None and w.wind_ms is None:
+        return
     if w.place:
         out.append(f"<b>{escape(w.place)}</b>")
     out.append(escape(w.summary or ""))
@@ -134,20 +136,17 @@ def render_weather(w: WeatherResult) -> str:
         details.append(f"Ветер: {w.wind_ms:.1f} м/с")
     if details:
         out.append(escape(" | ".join(details)))
-    if w.advice:
-        out.append(_bullets(w.advice))
-    return "\n".join([x for x in out if x])
+    _bullets(w.advice, out)
 
-def render_route(r: RouteResult) -> str:
-    out: List[str] = []
+def render_route(r: RouteResult, out: List[str]) -> None:
     if r.points:
         out.append("<b>Маршрут по точкам</b>")
-        out.append(_bullets(r.points[:10]))
+        _bullets(r.points[:10], out)
     else:
         out.append(f"<b>{escape(r.start)}</b> → <b>{escape(r.end)}</b>")
 
     if r.distance_km is not None or r.duration_min is not None:
-        bits = []
+        bits: List[str] = []
         if r.distance_km is not None:
             bits.append(f"{r.distance_km:.1f} км")
         if r.duration_min is not None:
@@ -157,31 +156,34 @@ def render_route(r: RouteResult) -> str:
     if r.steps:
         out.append("\n<b>Шаги</b>")
         for s in r.steps[:12]:
-            out.append(f"• {escape(s.instruction)}")
+            out.append(_BULLET + escape(s.instruction))
 
     if r.maps_url:
         out.append(f"\n<b>Google Maps:</b> {escape(r.maps_url)}")
 
     if r.notes:
         out.append("\n<b>Заметки</b>")
-        out.append(_bullets(r.notes))
-
-    return "\n".join([x for x in out if x])
+        _bullets(r.notes, out)
 
 def split_telegram_html(text: str, limit: int = TELEGRAM_LIMIT) -> List[str]:
     text = text.strip()
     if len(text) <= limit:
         return [text]
-    lines = text.split("\n")
     chunks: List[str] = []
-    cur = ""
-    for line in lines:
-        candidate = (cur + "\n" + line) if cur else line
-        if len(candidate) > limit and cur:
-            chunks.append(cur)
-            cur = line
+    # rolling length instead of re-concatenating the chunk for every line
+    buf: List[str] = []
+    cur_len = 0
+    for line in text.split("\n"):
+        if not cur_len:
+            buf = [line]
+            cur_len = len(line)
+        elif cur_len + 1 + len(line) > limit:
+            chunks.append("\n".join(buf))
+            buf = [line]
+            cur_len = len(line)
         else:
-            cur = candidate
-    if cur:
-        chunks.append(cur)
+            buf.append(line)
+            cur_len += 1 + len(line)
+    if cur_len:
+        chunks.append("\n".join(buf))
     return chunks
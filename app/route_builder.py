@@ -1,76 +1,120 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Optional, Tuple
+import asyncio
 import math
 import urllib.parse
-import httpx
+import orjson
 
-from .cache import TTLCache
+from .cache import NEGATIVE, NEGATIVE_TTL_SECONDS, SingleFlight, TTLCache
+from .http_client import get_client
 
-@dataclass
+@dataclass(slots=True)
 class GeoPoint:
     name: str
     lat: float
     lon: float
+    # "lat,lon" for map URLs, formatted once (6 decimals is ~0.1 m)
+    coord: str = field(init=False, repr=False, compare=False)
 
-def _haversine_km(a: Tuple[float,float], b: Tuple[float,float]) -> float:
-    (lat1, lon1), (lat2, lon2) = a, b
-    R = 6371.0
-    p1, p2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dl = math.radians(lon2 - lon1)
-    x = math.sin(dphi/2)**2 + math.cos(p1)*math.cos(p2)*math.sin(dl/2)**2
-    return 2*R*math.asin(math.sqrt(x))
+    def __post_init__(self) -> None:
+        self.coord = f"{round(self.lat, 6)},{round(self.lon, 6)}"
+
+# ~0.5 degree (~55 km): beyond that NN ordering uses the haversine term
+_FLAT_SPAN_RAD = math.radians(0.5)
 
 class POIRouteBuilder:
     def __init__(self, cache: Optional[TTLCache] = None):
         self.cache = cache or TTLCache(default_ttl_seconds=7*24*3600)
+        # Nominatim usage policy: keep the number of parallel lookups small
+        self._sem = asyncio.Semaphore(4)
+        # concurrent misses on the same query share one Nominatim request
+        self._flight = SingleFlight()
 
     async def geocode(self, query: str) -> Optional[Tuple[float,float]]:
         q = (query or "").strip()
         if not q:
             return None
-        ck = f"geo:{q.lower()}"
-        cached = self.cache.get(ck)
+        # same `geo_ll:`/`nom_miss:` keys as RouteAgent.geocode_nominatim
+        qk = q.casefold()
+        cached = self.cache.get(f"geo_ll:{qk}")
         if cached is not None:
-            return cached
+            return cached[0], cached[1]
+        if self.cache.get(f"nom_miss:{qk}") is NEGATIVE:
+            return None
+        return await self._flight.do(qk, lambda: self._fetch(q, qk))
 
+    async def _fetch(self, q: str, qk: str) -> Optional[Tuple[float,float]]:
         url = "https://nominatim.openstreetmap.org/search"
         params = {"q": q, "format": "json", "limit": 1}
         headers = {"User-Agent": "travel-bot/1.0"}
-        async with httpx.AsyncClient(timeout=20, headers=headers) as client:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            data = r.json()
-            if not data:
-                return None
-            lat, lon = float(data[0]["lat"]), float(data[0]["lon"])
-            self.cache.set(ck, (lat, lon))
-            return lat, lon
+        async with self._sem:
+            r = await get_client().get(url, params=params, headers=headers, timeout=20)
+        r.raise_for_status()
+        data = orjson.loads(r.content)
+        if not data:
+            self.cache.set(f"nom_miss:{qk}", NEGATIVE, ttl_seconds=NEGATIVE_TTL_SECONDS)
+            return None
+        lat, lon = float(data[0]["lat"]), float(data[0]["lon"])
+        self.cache.set(f"geo_ll:{qk}", (lat, lon))
+        return lat, lon
+
+    async def geocode_many(self, queries: List[str]) -> List[Optional[Tuple[float,float]]]:
+        """Geocode a batch; duplicate queries hit Nominatim once. Failed lookups give None."""
+        keys = [(q or "").strip().casefold() for q in queries]
+        uniq: dict[str, str] = {}
+        for k, q in zip(keys, queries):
+            uniq.setdefault(k, q)
+        res = await asyncio.gather(*[self.geocode(q) for q in uniq.values()], return_exceptions=True)
+        by_key = {k: (None if isinstance(r, Exception) else r) for k, r in zip(uniq, res)}
+        return [by_key[k] for k in keys]
 
     def order_points_nearest(self, points: List[GeoPoint]) -> List[GeoPoint]:
         if len(points) <= 2:
             return points
-        remaining = points[:]
-        route = [remaining.pop(0)]
-        while remaining:
-            last = route[-1]
-            best_i = 0
-            best_d = 1e18
-            for i,p in enumerate(remaining):
-                d = _haversine_km((last.lat,last.lon),(p.lat,p.lon))
-                if d < best_d:
-                    best_d = d
-                    best_i = i
-            route.append(remaining.pop(best_i))
+        # radians and cos(lat) once per point, as parallel lists
+        n = len(points)
+        lats = [math.radians(p.lat) for p in points]
+        lons = [math.radians(p.lon) for p in points]
+        # city scale: flat (equirectangular) projection at the mean latitude ranks like
+        # haversine to ~0.1% and needs no trig in the loop; wider sets keep haversine
+        flat = (max(lats) - min(lats) <= _FLAT_SPAN_RAD and max(lons) - min(lons) <= _FLAT_SPAN_RAD)
+        if flat:
+            k = math.cos((max(lats) + min(lats))/2)
+            lons = [lo*k for lo in lons]
+        else:
+            coss = [math.cos(la) for la in lats]
+        sin = math.sin
+        visited = bytearray(n)
+        visited[0] = 1
+        route = [points[0]]
+        last = 0
+        for _ in range(n - 1):
+            lat0, lon0 = lats[last], lons[last]
+            cos0 = 0.0 if flat else coss[last]
+            best_j, best_x = -1, math.inf
+            for j in range(n):
+                if visited[j]:
+                    continue
+                # rank terms only (squared planar distance / haversine x): both are
+                # monotonic in the distance, so no sqrt/asin is needed to compare
+                if flat:
+                    x = (lats[j] - lat0)**2 + (lons[j] - lon0)**2
+                else:
+                    x = sin((lats[j] - lat0)/2)**2 + cos0*coss[j]*sin((lons[j] - lon0)/2)**2
+                if best_j < 0 or x < best_x:
+                    best_j, best_x = j, x
+            visited[best_j] = 1
+            route.append(points[best_j])
+            last = best_j
         return route
 
     def google_maps_url(self, ordered: List[GeoPoint], travelmode: str = "walking") -> Optional[str]:
         if len(ordered) < 2:
             return None
-        origin = f"{ordered[0].lat},{ordered[0].lon}"
-        dest = f"{ordered[-1].lat},{ordered[-1].lon}"
-        waypoints = "|".join([f"{p.lat},{p.lon}" for p in ordered[1:-1]])
+        origin = ordered[0].coord
+        dest = ordered[-1].coord
+        waypoints = "|".join([p.coord for p in ordered[1:-1]])
         base = "https://www.google.com/maps/dir/?api=1"
         params = {"origin": origin, "destination": dest, "travelmode": travelmode}
         if waypoints:
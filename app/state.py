@@ -1,10 +1,13 @@
 from __future__ import annotations
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Literal, Tuple, Any
+from typing import Optional, List, Deque, Dict, Literal, Tuple, Any
 
 Need = Literal["tourism", "legal", "weather", "route"]
 
-@dataclass
+HISTORY_TURNS = 8
+
+@dataclass(slots=True)
 class UserState:
     country: Optional[str] = None
     city: Optional[str] = None
@@ -15,7 +18,8 @@ class UserState:
     pending_needs: List[Need] = field(default_factory=list)
     pending_input: Optional[str] = None  # 'route_points' | 'destination'
 
-    history: List[Dict[str, str]] = field(default_factory=list)
+    # last HISTORY_TURNS messages; older ones fall off on append
+    history: Deque[Dict[str, str]] = field(default_factory=lambda: deque(maxlen=HISTORY_TURNS))
     summary: str = ""
 
     # route UI (A->B or POI)
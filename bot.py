@@ -1,8 +1,8 @@
 import asyncio
-import httpx
 import html
+from functools import lru_cache
 from aiogram import Bot, Dispatcher, F
-from aiogram.types import Message, CallbackQuery, BufferedInputFile, InlineKeyboardButton
+from aiogram.types import Message, CallbackQuery, BufferedInputFile, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
@@ -11,7 +11,8 @@ from app.config import settings
 from app.orchestrator import Orchestrator
 from app.state import StateStore
 from app.renderer import split_telegram_html
-from app.route_builder import POIRouteBuilder, GeoPoint
+from app.route_builder import GeoPoint
+from app.http_client import aclose_client, get_client
 
 
 async def _download_image_bytes(url: str) -> bytes | None:
@@ -20,14 +21,15 @@ async def _download_image_bytes(url: str) -> bytes | None:
     if not u:
         return None
     try:
-        async with httpx.AsyncClient(timeout=25, follow_redirects=True) as client:
-            r = await client.get(u)
-            r.raise_for_status()
-            return r.content
+        r = await get_client().get(u, timeout=25, follow_redirects=True)
+        r.raise_for_status()
+        return r.content
     except Exception:
         return None
 
 
+# Static keyboards: built once, the same markup object is reused for every message
+@lru_cache(maxsize=None)
 def main_menu_kb():
     kb = InlineKeyboardBuilder()
     kb.button(text="🏙️ Туризм", callback_data="need:tourism")
@@ -38,16 +40,20 @@ def main_menu_kb():
     kb.adjust(2, 2, 1)
     return kb.as_markup()
 
+_PLAN_DAY_BTN = InlineKeyboardButton(text="📅 План на день", callback_data="plan:day")
+
 def poi_list_kb(poi_items):
-    kb = InlineKeyboardBuilder()
-    for i, it in enumerate(poi_items[:10]):
-        title = (it.get("name") or f"Место {i+1}").strip()
-        kb.button(text=title[:32], callback_data=f"poi:{i}")
+    buttons = [
+        InlineKeyboardButton(text=(it.get("name") or f"Место {i+1}").strip()[:32], callback_data=f"poi:{i}")
+        for i, it in enumerate(poi_items[:10])
+    ]
     # extra actions
-    kb.button(text="📅 План на день", callback_data="plan:day")
-    kb.adjust(2, 2, 1)
-    return kb.as_markup()
+    buttons.append(_PLAN_DAY_BTN)
+    # same layout as InlineKeyboardBuilder.adjust(2, 2, 1): two rows of 2, then one per row
+    rows = [buttons[0:2], buttons[2:4]] + [[b] for b in buttons[4:]]
+    return InlineKeyboardMarkup(inline_keyboard=[r for r in rows if r])
 
+@lru_cache(maxsize=None)
 def poi_detail_kb():
     kb = InlineKeyboardBuilder()
     kb.button(text="⬅️ Назад к списку", callback_data="poi:list")
@@ -66,7 +72,10 @@ def food_kb(food_items):
     return kb.as_markup() if kb.buttons else None
 
 def _escape(s: str) -> str:
-    return html.escape(s or "")
+    # Text nodes only need &, <, > escaped; most names contain none, so skip the replaces
+    if s and ("&" in s or "<" in s or ">" in s):
+        return html.escape(s, quote=False)
+    return s or ""
 
 def _make_day_plan_text(city: str | None, country: str | None, ordered_pois: list[str], food_items: list[dict]) -> str:
     # pick 4-6 POIs
@@ -117,7 +126,8 @@ async def main():
     dp = Dispatcher()
     orch = Orchestrator()
     store = StateStore()
-    poi_route_builder = POIRouteBuilder()
+    # shares the orchestrator's geocode cache (sqlite-backed when CACHE_DB_PATH is set)
+    poi_route_builder = orch.poi_builder
 
     @dp.message(F.text == "/start")
     async def start(m: Message):
@@ -130,76 +140,76 @@ async def main():
             reply_markup=main_menu_kb()
         )
 
-        @dp.callback_query(F.data.startswith("need:"))
-        async def menu_click(cb: CallbackQuery):
-            user_id = cb.from_user.id
-            state = store.get(user_id)
-            action = cb.data.split(":", 1)[1]
-
-            if action == "reset":
-                store.reset(user_id)
-                await cb.message.answer("Сбросил контекст ✅", reply_markup=main_menu_kb())
-                await cb.answer()
-                return
+    @dp.callback_query(F.data.startswith("need:"))
+    async def menu_click(cb: CallbackQuery):
+        user_id = cb.from_user.id
+        state = store.get(user_id)
+        action = cb.data.split(":", 1)[1]
 
-            has_destination = bool((state.city and state.city.strip()) or (state.country and state.country.strip()))
+        if action == "reset":
+            store.reset(user_id)
+            await cb.message.answer("Сбросил контекст ✅", reply_markup=main_menu_kb())
+            await cb.answer()
+            return
 
-            # If destination is already known, run immediately (no extra questions)
-            if action in ("tourism", "legal", "weather") and has_destination:
-                state.pending_needs = []
-                state.pending_input = None
+        has_destination = bool((state.city and state.city.strip()) or (state.country and state.country.strip()))
 
-                await cb.message.answer("Думаю… 🧠")
-                try:
-                    html_answer = await orch.handle(
-                        user_text=f"Покажи {action}",
-                        state=state,
-                        forced_needs=[action],
-                    )
-                except Exception as e:
-                    print("ERROR:", e)
-                    await cb.message.answer("Что-то пошло не так 😕 Попробуй повторить.", reply_markup=main_menu_kb())
-                    await cb.answer()
-                    return
-
-                for chunk in split_telegram_html(html_answer):
-                    await cb.message.answer(chunk, reply_markup=main_menu_kb())
-
-                if action == "tourism":
-                    if state.poi_items:
-                        await cb.message.answer(
-                            "🏛️ <b>Достопримечательности</b>\n"
-                            "Нажми на кнопку — пришлю фото + подробности + карту:",
-                            reply_markup=poi_list_kb(state.poi_items),
-                        )
-                    mk = food_kb(state.food_items)
-                    if mk:
-                        await cb.message.answer(
-                            "🍜 <b>Где поесть</b>\n"
-                            "Кнопки ведут в Google Maps:",
-                            reply_markup=mk,
-                        )
+        # If destination is already known, run immediately (no extra questions)
+        if action in ("tourism", "legal", "weather") and has_destination:
+            state.pending_needs = []
+            state.pending_input = None
 
+            await cb.message.answer("Думаю… 🧠")
+            try:
+                html_answer = await orch.handle(
+                    user_text=f"Покажи {action}",
+                    state=state,
+                    forced_needs=[action],
+                )
+            except Exception as e:
+                print("ERROR:", e)
+                await cb.message.answer("Что-то пошло не так 😕 Попробуй повторить.", reply_markup=main_menu_kb())
                 await cb.answer()
                 return
 
-            # Otherwise, ask for needed input
-            state.pending_needs = [action]
+            for chunk in split_telegram_html(html_answer):
+                await cb.message.answer(chunk, reply_markup=main_menu_kb())
 
-            if action == "route":
-                state.pending_input = "route_points"
-                await cb.message.answer(
-                    "Напиши маршрут в формате: <b>Откуда -> Куда</b>\n"
-                    "Например: <i>Амстердам -> Париж</i>\n\n"
-                    "Или напиши: <i>«Составь маршрут по достопримечательностям на 1 день в Париже»</i> — тогда я сделаю маршрут по местам.",
-                )
-            else:
-                state.pending_input = "destination"
-                await cb.message.answer(
-                    "Ок. Напиши город/страну и детали (даты/интересы), например: <i>Рим на 4 дня в январе</i>"
-                )
+            if action == "tourism":
+                if state.poi_items:
+                    await cb.message.answer(
+                        "🏛️ <b>Достопримечательности</b>\n"
+                        "Нажми на кнопку — пришлю фото + подробности + карту:",
+                        reply_markup=poi_list_kb(state.poi_items),
+                    )
+                mk = food_kb(state.food_items)
+                if mk:
+                    await cb.message.answer(
+                        "🍜 <b>Где поесть</b>\n"
+                        "Кнопки ведут в Google Maps:",
+                        reply_markup=mk,
+                    )
 
             await cb.answer()
+            return
+
+        # Otherwise, ask for needed input
+        state.pending_needs = [action]
+
+        if action == "route":
+            state.pending_input = "route_points"
+            await cb.message.answer(
+                "Напиши маршрут в формате: <b>Откуда -> Куда</b>\n"
+                "Например: <i>Амстердам -> Париж</i>\n\n"
+                "Или напиши: <i>«Составь маршрут по достопримечательностям на 1 день в Париже»</i> — тогда я сделаю маршрут по местам.",
+            )
+        else:
+            state.pending_input = "destination"
+            await cb.message.answer(
+                "Ок. Напиши город/страну и детали (даты/интересы), например: <i>Рим на 4 дня в январе</i>"
+            )
+
+        await cb.answer()
 
     @dp.callback_query(F.data.startswith("poi:"))
     async def poi_click(cb: CallbackQuery):
@@ -298,25 +308,19 @@ async def main():
             country = state.country
             cc = ", ".join([x for x in [city, country] if x]).strip()
 
-            # geocode points (limit to 6)
-            async def geo_for(it: dict):
+            # geocode points (limit to 6); repeated queries are looked up once
+            items = state.poi_items[:6]
+            names, queries = [], []
+            for it in items:
                 q = (it.get("query") or "").strip()
                 name = (it.get("name") or "").strip()
                 if not q:
                     q = f"{name}, {cc}" if cc else name
-                ll = await poi_route_builder.geocode(q)
-                return (name, q, ll)
-
-            items = state.poi_items[:6]
-            results = await asyncio.gather(*[geo_for(it) for it in items], return_exceptions=True)
+                names.append(name)
+                queries.append(q)
+            results = await poi_route_builder.geocode_many(queries)
 
-            geos = []
-            for r in results:
-                if isinstance(r, Exception):
-                    continue
-                name, q, ll = r
-                if ll:
-                    geos.append(GeoPoint(name=name, lat=ll[0], lon=ll[1]))
+            geos = [GeoPoint(name=name, lat=ll[0], lon=ll[1]) for name, ll in zip(names, results) if ll]
 
             if len(geos) >= 2:
                 ordered = poi_route_builder.order_points_nearest(geos)
@@ -346,7 +350,6 @@ async def main():
         text = (m.text or "").strip()
 
         state.history.append({"role": "user", "text": text})
-        state.history = state.history[-8:]
 
         forced_needs = state.pending_needs[:] if state.pending_needs else None
         forced_start = None
@@ -380,7 +383,6 @@ async def main():
             return
 
         state.history.append({"role": "assistant", "text": html_answer})
-        state.history = state.history[-8:]
 
         for chunk in split_telegram_html(html_answer):
             await m.answer(chunk, reply_markup=main_menu_kb())
@@ -432,7 +434,10 @@ async def main():
 
             await m.answer("Маршрут на карте:", reply_markup=kb.as_markup())
 
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await aclose_client()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,25 +1,31 @@
+import asyncio
 import os
-from typing import Dict, List
-from tqdm import tqdm
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from tqdm.asyncio import tqdm
 
-from eval_llm.utils import load_jsonl, norm_text, Timer
+from tests.utils import load_jsonl, norm_text, Timer
 
 from app.agents.legal_agent import LegalAgent
 from app.config import settings
 
+_H_RE = re.compile(r"^\s{0,3}#{2,3}\s+(.+?)\s*$")
+_B_RE = re.compile(r"^\s*[-•]\s+(.*)$")
+_COUNTRY_RU_RE = re.compile(r"^\s*country_ru\s*:\s*(.+?)\s*$", re.I | re.M)
+
 def parse_md_sections(md: str) -> Dict[str, List[str]]:
-    import re
     sections={}
     cur="root"
     sections[cur]=[]
     for line in md.splitlines():
         line=line.rstrip()
-        h=re.match(r"^\s{0,3}#{2,3}\s+(.+?)\s*$", line)
+        h=_H_RE.match(line)
         if h:
             cur=h.group(1).strip()
             sections.setdefault(cur, [])
             continue
-        b=re.match(r"^\s*[-•]\s+(.*)$", line)
+        b=_B_RE.match(line)
         if b:
             item=b.group(1).strip()
             if item:
@@ -34,9 +40,34 @@ def pick(sections: Dict[str,List[str]], keywords: List[str]) -> List[str]:
             out.extend(items)
     return out
 
-def main():
+@lru_cache(maxsize=256)
+def _kb_file(path: str) -> Optional[Tuple[Optional[str], bool]]:
+    """(country_ru header, has entry/prohibition bullets) of a KB file; None if missing.
+    Cases of the same country share one read + parse."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        md=f.read()
+    m=_COUNTRY_RU_RE.search(md)
+    header_country=m.group(1).strip() if m else None
+    secs=parse_md_sections(md)
+    exp_entry=pick(secs, ["въезд","документ","регистрац","услов"])
+    exp_prohib=pick(secs, ["огранич","запрет","штраф","правил"])
+    return header_country, (len(exp_entry)+len(exp_prohib)) > 0
+
+async def _answer(agent: LegalAgent, c: Dict[str, Any]):
+    # one case: (result or None on failure, elapsed seconds incl. waiting for an LLM slot)
+    with Timer() as t:
+        try:
+            res = await agent.arun(country=c.get("country"), city=c.get("city"), question=c.get("question",""))
+        except Exception as e:
+            print(f"[{c['id']}] FAIL: {e}")
+            return None, None
+    return res, t.elapsed_s
+
+async def main():
     # Requires: index built + GigaChat embeddings credentials valid
-    cases = load_jsonl("eval_llm/dataset_legal.jsonl")
+    cases = load_jsonl("tests/dataset_legal.jsonl")
     agent = LegalAgent()
 
     total=len(cases)
@@ -45,42 +76,30 @@ def main():
     completeness_ok=0
     timings=[]
 
-    for c in tqdm(cases, desc="legal"):
-        country=c.get("country")
-        city=c.get("city")
-        q=c.get("question","")
+    # all cases in flight at once; GIGACHAT_MAX_CONCURRENCY still caps the LLM calls
+    outcomes = await tqdm.gather(*[_answer(agent, c) for c in cases], desc="legal")
 
-        with Timer() as t:
-            try:
-                res = agent.run(country=country, city=city, question=q)
-                ok += 1
-            except Exception as e:
-                print(f"[{c['id']}] FAIL: {e}")
-                continue
-        timings.append(t.elapsed_s)
+    for c, (res, elapsed) in zip(cases, outcomes):
+        country=c.get("country")
+        if res is None:
+            continue
+        ok += 1
+        timings.append(elapsed)
 
         # purity: local source base name should correspond to the country's md (best-effort)
         # We only check that at least one local base appears and it is not obviously another country file.
         srcs = [s for s in (res.sources or []) if s and "http" not in s]
         if srcs:
             base=srcs[0]
+            kb = _kb_file(os.path.join(settings.legal_kb_dir, base + ".md"))
             # if file exists - good
-            if os.path.exists(os.path.join(settings.legal_kb_dir, base + ".md")):
+            if kb is not None:
                 # ensure it matches requested country_ru header if present
-                md=open(os.path.join(settings.legal_kb_dir, base + ".md"), "r", encoding="utf-8").read()
-                header_country=None
-                import re
-                m=re.search(r"^\s*country_ru\s*:\s*(.+?)\s*$", md, flags=re.I|re.M)
-                if m:
-                    header_country=m.group(1).strip()
+                header_country, need_any = kb
                 if not header_country or norm_text(header_country)==norm_text(country):
                     country_pure += 1
 
                 # completeness: if md contains bullets under entry/prohib sections, result should include them
-                secs=parse_md_sections(md)
-                exp_entry=pick(secs, ["въезд","документ","регистрац","услов"])
-                exp_prohib=pick(secs, ["огранич","запрет","штраф","правил"])
-                need_any = (len(exp_entry)+len(exp_prohib)) > 0
                 got_any = bool(res.entry_and_registration) or bool(res.prohibitions_and_fines)
                 if (not need_any) or got_any:
                     completeness_ok += 1
@@ -95,4 +114,4 @@ def main():
         print(f"latency_mean_s: {st.mean(timings):.2f}")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -1,21 +1,35 @@
 import os
 from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Set
 
 from tqdm import tqdm
 
-from eval_llm.utils import load_jsonl, norm_text, Timer
+from tests.utils import load_jsonl, norm_text, Timer
 
 # IMPORTANT: run from project root, so imports resolve.
 from app.agents.router_agent import RouterAgent
+from app.config import settings
 
 LABELS = ["tourism","legal","weather","route"]
+SLOTS = ["city","country","start_location","end_location"]
+SLOT_LABELS = {"city": "city", "country": "country", "start_location": "start", "end_location": "end"}
 
 def as_set(needs: List[str]) -> Set[str]:
     return set([n for n in (needs or []) if n in LABELS])
 
+def _decide(agent: RouterAgent, c: Dict[str, Any]):
+    # one case: (decision or None on failure, elapsed seconds)
+    with Timer() as t:
+        try:
+            dec = agent.decide(c["text"], memory_hint="")
+        except Exception as e:
+            print(f"[{c['id']}] FAIL parse: {e}")
+            return None, None
+    return dec, t.elapsed_s
+
 def main():
-    cases = load_jsonl("eval_llm/dataset_router.jsonl")
+    cases = load_jsonl("tests/dataset_router.jsonl")
     agent = RouterAgent()
 
     total=0
@@ -26,21 +40,22 @@ def main():
     tp=Counter(); fp=Counter(); fn=Counter()
 
     # entity accuracy
-    city_ok=0; country_ok=0; start_ok=0; end_ok=0; city_total=0; country_total=0; start_total=0; end_total=0
+    slot_ok=Counter(); slot_total=Counter()
 
     timings=[]
 
-    for c in tqdm(cases, desc="router"):
+    # cases are independent LLM calls: run them concurrently (up to the GigaChat
+    # concurrency limit), results come back in dataset order
+    with ThreadPoolExecutor(max_workers=settings.gigachat_max_concurrency) as ex:
+        outcomes = list(tqdm(ex.map(lambda c: _decide(agent, c), cases), total=len(cases), desc="router"))
+
+    for c, (dec, elapsed) in zip(cases, outcomes):
         total += 1
         exp = c.get("expected", {})
-        with Timer() as t:
-            try:
-                dec = agent.decide(c["text"], memory_hint="")
-                parse_ok += 1
-            except Exception as e:
-                print(f"[{c['id']}] FAIL parse: {e}")
-                continue
-        timings.append(t.elapsed_s)
+        if dec is None:
+            continue
+        parse_ok += 1
+        timings.append(elapsed)
 
         got = as_set(getattr(dec, "needs", []))
         exp_set = as_set(exp.get("needs", []))
@@ -53,23 +68,12 @@ def main():
             elif lab in got and lab not in exp_set: fp[lab]+=1
             elif lab not in got and lab in exp_set: fn[lab]+=1
 
-        # slots
-        if "city" in exp:
-            city_total += 1
-            if norm_text(getattr(dec,"city",None)) == norm_text(exp.get("city")):
-                city_ok += 1
-        if "country" in exp:
-            country_total += 1
-            if norm_text(getattr(dec,"country",None)) == norm_text(exp.get("country")):
-                country_ok += 1
-        if "start_location" in exp:
-            start_total += 1
-            if norm_text(getattr(dec,"start_location",None)) == norm_text(exp.get("start_location")):
-                start_ok += 1
-        if "end_location" in exp:
-            end_total += 1
-            if norm_text(getattr(dec,"end_location",None)) == norm_text(exp.get("end_location")):
-                end_ok += 1
+        # slots: normalise only the fields this case actually expects
+        for f in SLOTS:
+            if f in exp:
+                slot_total[f] += 1
+                if norm_text(getattr(dec, f, None)) == norm_text(exp[f]):
+                    slot_ok[f] += 1
 
     def prf(lab):
         p = tp[lab] / (tp[lab]+fp[lab]) if (tp[lab]+fp[lab]) else 0.0
@@ -86,14 +90,9 @@ def main():
         p,r,f = prf(lab)
         print(f"{lab:7s}  P={p:.2f} R={r:.2f} F1={f:.2f}  (tp={tp[lab]}, fp={fp[lab]}, fn={fn[lab]})")
 
-    if city_total:
-        print(f"city_accuracy: {city_ok/city_total:.3f}")
-    if country_total:
-        print(f"country_accuracy: {country_ok/country_total:.3f}")
-    if start_total:
-        print(f"start_accuracy: {start_ok/start_total:.3f}")
-    if end_total:
-        print(f"end_accuracy: {end_ok/end_total:.3f}")
+    for f in SLOTS:
+        if slot_total[f]:
+            print(f"{SLOT_LABELS[f]}_accuracy: {slot_ok[f]/slot_total[f]:.3f}")
 
     if timings:
         import statistics as st
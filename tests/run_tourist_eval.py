@@ -1,12 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict
 from tqdm import tqdm
 
-from eval_llm.utils import load_jsonl, contains_cyrillic_ratio, price_like, Timer
+from tests.utils import load_jsonl, contains_cyrillic_ratio, price_like, Timer
 
 from app.agents.tourist_agent import TouristAgent
+from app.config import settings
+
+def _answer(agent: TouristAgent, c: Dict[str, Any]):
+    # one case: (result or None on failure, elapsed seconds)
+    with Timer() as t:
+        try:
+            res = agent.run(
+                country=c.get("country"),
+                city=c.get("city"),
+                dates=c.get("dates"),
+                question=c.get("question",""),
+                summary=""
+            )
+        except Exception as e:
+            print(f"[{c['id']}] FAIL parse: {e}")
+            return None, None
+    return res, t.elapsed_s
 
 def main():
-    cases = load_jsonl("eval_llm/dataset_tourist.jsonl")
+    cases = load_jsonl("tests/dataset_tourist.jsonl")
     agent = TouristAgent()
 
     total=len(cases)
@@ -18,22 +36,16 @@ def main():
     no_price_ok=0
     timings=[]
 
-    for c in tqdm(cases, desc="tourist"):
+    # independent LLM calls: run concurrently, results kept in dataset order
+    with ThreadPoolExecutor(max_workers=settings.gigachat_max_concurrency) as ex:
+        outcomes = list(tqdm(ex.map(lambda c: _answer(agent, c), cases), total=len(cases), desc="tourist"))
+
+    for c, (res, elapsed) in zip(cases, outcomes):
         expect = c.get("expect", {})
-        with Timer() as t:
-            try:
-                res = agent.run(
-                    country=c.get("country"),
-                    city=c.get("city"),
-                    dates=c.get("dates"),
-                    question=c.get("question",""),
-                    summary=""
-                )
-                ok_parse += 1
-            except Exception as e:
-                print(f"[{c['id']}] FAIL parse: {e}")
-                continue
-        timings.append(t.elapsed_s)
+        if res is None:
+            continue
+        ok_parse += 1
+        timings.append(elapsed)
 
         # checks
         if len(getattr(res, "highlights", []) or []) >= int(expect.get("highlights_min", 4)):
@@ -51,7 +63,7 @@ def main():
             ru_ok += 1
 
         # heuristic: avoid exact prices
-        full_text = str(res.model_dump()) if hasattr(res,"model_dump") else str(res)
+        full_text = res.model_dump_json() if hasattr(res,"model_dump_json") else str(res)
         if not price_like(full_text):
             no_price_ok += 1
 
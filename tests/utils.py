@@ -1,39 +1,50 @@
-import json, time, re
+import time, re
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-def load_jsonl(path: str) -> List[Dict[str, Any]]:
-    out=[]
-    with open(path, "r", encoding="utf-8") as f:
+import orjson
+
+_WS_RE = re.compile(r"[\s\t\n]+")
+_PUNCT_RE = re.compile(r"[^0-9a-zа-яё\- ]+", re.I)
+_CYR_LETTERS = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+_CYR_LETTERS += _CYR_LETTERS.upper()
+# crude: any currency sign or common price patterns
+_PRICE_RE = re.compile(r"(€|\$|₽|руб\.?|usd|eur|\b\d{1,3}\s?(€|\$|₽)\b)", re.I)
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    # bytes straight into orjson: no str decode per line, one record in memory at a time
+    with open(path, "rb") as f:
         for line in f:
             line=line.strip()
-            if not line: 
+            if not line:
                 continue
-            out.append(json.loads(line))
-    return out
+            yield orjson.loads(line)
+
+def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    return list(iter_jsonl(path))
 
 def norm_text(s: Optional[str]) -> str:
     if not s:
         return ""
     s=s.strip().lower()
-    s=re.sub(r"[\s\t\n]+", " ", s)
-    s=re.sub(r"[^0-9a-zа-яё\- ]+", "", s, flags=re.I)
+    s=_WS_RE.sub(" ", s)
+    s=_PUNCT_RE.sub("", s)
     return s.strip()
 
 def contains_cyrillic_ratio(text: str) -> float:
     if not text:
         return 0.0
-    letters=[ch for ch in text if ch.isalpha()]
+    # both counts run in C: str.isalpha per char via map, str.count per Cyrillic letter
+    letters=sum(map(str.isalpha, text))
     if not letters:
         return 0.0
-    cyr=sum(1 for ch in letters if "а" <= ch.lower() <= "я" or ch.lower()=="ё")
-    return cyr/len(letters)
+    cyr=sum(map(text.count, _CYR_LETTERS))
+    return cyr/letters
 
 def price_like(text: str) -> bool:
     if not text:
         return False
-    # crude: any currency sign or common price patterns
-    return bool(re.search(r"(€|\$|₽|руб\.?|usd|eur|\b\d{1,3}\s?(€|\$|₽)\b)", text, flags=re.I))
+    return bool(_PRICE_RE.search(text))
 
 @dataclass
 class Timing: